@@ -0,0 +1,272 @@
+"""Spending forecasts and anomaly flags, computed with NumPy.
+
+A user's history is loaded once into ``ExpenseArrays``: parallel arrays of
+days since the epoch, dense category codes and int64 amounts already
+converted to one currency. Everything else (monthly totals, rolling means,
+month-end forecasts, per-category z-scores and medians) is whole-array
+arithmetic on those. Loaded arrays are cached per user and currency until a
+cheap fingerprint query shows the user's expenses changed.
+
+Archived months contribute their ``MonthlySummary`` totals to the monthly
+figures; anomaly statistics use the live (unarchived) expenses.
+"""
+import calendar
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import func
+
+from app import db
+from categories import get_category
+from currency import minor_units
+from models import Expense, MonthlySummary
+
+ROLLING_MONTHS = 3
+HISTORY_MONTHS = 12
+# A category needs this many expenses before any of them can be flagged
+MIN_HISTORY = 5
+Z_THRESHOLD = 3.0
+MEDIAN_MULTIPLE = 5.0
+MAX_ANOMALIES = 20
+CACHE_SIZE = 256
+
+
+class ExpenseArrays:
+    """A user's expenses as parallel NumPy arrays, sorted by date."""
+
+    __slots__ = ('currency', 'category_ids', 'ids', 'days', 'months', 'codes', 'amounts',
+                 'summary_months', 'summary_codes', 'summary_amounts')
+
+    def __init__(self, currency, category_ids, ids, days, codes, amounts,
+                 summary_months, summary_codes, summary_amounts):
+        self.currency = currency
+        # codes index into category_ids, so per-category arrays stay dense
+        self.category_ids = category_ids
+        self.ids = ids
+        self.days = days
+        self.months = _months(days)
+        self.codes = codes
+        self.amounts = amounts
+        self.summary_months = summary_months
+        self.summary_codes = summary_codes
+        self.summary_amounts = summary_amounts
+
+
+def _months(days):
+    """Months since 1970-01 for an array of days since 1970-01-01."""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def _convert(amounts, currencies, currency, rates):
+    """Vectorized ``RateTable.convert_minor``: one factor per distinct source currency."""
+    if not len(amounts):
+        return np.zeros(0, dtype=np.int64)
+    sources, index = np.unique(currencies, return_inverse=True)
+    factors = np.array([
+        rates.rate(src, currency) * 10 ** (minor_units(currency) - minor_units(src)) for src in sources
+    ])
+    return np.rint(amounts * factors[index]).astype(np.int64)
+
+
+def _load(user_id, currency, rates):
+    rows = (
+        db.session.query(Expense.id, Expense.date, Expense.category_id, Expense.currency, Expense.amount_minor)
+        .filter(Expense.user_id == user_id)
+        .order_by(Expense.date, Expense.id)
+        .all()
+    )
+    summaries = (
+        db.session.query(MonthlySummary.month, MonthlySummary.category_id, MonthlySummary.currency,
+                         MonthlySummary.amount_minor)
+        .filter(MonthlySummary.user_id == user_id)
+        .all()
+    )
+    ids, dates, cats, curs, amounts = (list(col) for col in zip(*rows)) if rows else ([],) * 5
+    s_months, s_cats, s_curs, s_amounts = (list(col) for col in zip(*summaries)) if summaries else ([],) * 4
+
+    category_ids, codes = np.unique(np.array(cats + s_cats, dtype=np.int64), return_inverse=True)
+    return ExpenseArrays(
+        currency=currency,
+        category_ids=category_ids,
+        ids=np.array(ids, dtype=np.int64),
+        days=np.array(dates, dtype='datetime64[D]').astype(np.int64),
+        codes=codes[:len(cats)],
+        amounts=_convert(np.array(amounts, dtype=np.int64), np.array(curs, dtype=object), currency, rates),
+        summary_months=_months(np.array(s_months, dtype='datetime64[D]').astype(np.int64)),
+        summary_codes=codes[len(cats):],
+        summary_amounts=_convert(np.array(s_amounts, dtype=np.int64), np.array(s_curs, dtype=object), currency, rates),
+    )
+
+
+def _fingerprint(user_id):
+    """Changes whenever the user's expenses are added, edited, deleted or archived."""
+    archived = (
+        db.session.query(func.coalesce(func.sum(MonthlySummary.expense_count), 0))
+        .filter(MonthlySummary.user_id == user_id)
+        .scalar_subquery()
+    )
+    return tuple(
+        db.session.query(func.count(Expense.id), func.max(Expense.id), func.max(Expense.updated_at), archived)
+        .filter(Expense.user_id == user_id)
+        .one()
+    )
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def expense_arrays(user_id, currency, rates):
+    """The user's ``ExpenseArrays`` in ``currency``, reloaded only when their data changed."""
+    key = (user_id, currency)
+    fingerprint = _fingerprint(user_id) + (rates.as_of,)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            _cache.move_to_end(key)
+            return cached[1]
+    data = _load(user_id, currency, rates)
+    with _cache_lock:
+        _cache[key] = (fingerprint, data)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return data
+
+
+def monthly_totals(data, first_month, last_month):
+    """``(months, categories)`` int64 matrix of spending; row 0 is ``first_month``."""
+    n_months = last_month - first_month + 1
+    n_cats = len(data.category_ids)
+    totals = np.zeros(n_months * n_cats)
+    for months, codes, amounts in ((data.months, data.codes, data.amounts),
+                                   (data.summary_months, data.summary_codes, data.summary_amounts)):
+        keep = (months >= first_month) & (months <= last_month)
+        cells = (months[keep] - first_month) * n_cats + codes[keep]
+        totals += np.bincount(cells, weights=amounts[keep], minlength=n_months * n_cats)
+    return np.rint(totals).astype(np.int64).reshape(n_months, n_cats)
+
+
+def rolling_mean(matrix, window):
+    """Trailing ``window``-row mean of each column; early rows average what exists."""
+    if not len(matrix):
+        return np.zeros(matrix.shape)
+    sums = np.vstack([np.zeros((1, matrix.shape[1])), np.cumsum(matrix, axis=0, dtype=np.float64)])
+    upper = np.arange(1, len(matrix) + 1)
+    lower = np.maximum(upper - window, 0)
+    return (sums[upper] - sums[lower]) / (upper - lower)[:, None]
+
+
+def forecast_month_end(spent, baseline, day, days_in_month):
+    """Spent so far plus the rest of the month at a blended monthly rate.
+
+    The rate is the run-rate projection weighted by how far into the month
+    ``day`` is, and the rolling ``baseline`` for the remainder, so early
+    forecasts lean on history and late ones on actual spending.
+    """
+    progress = day / days_in_month
+    projected = spent / progress
+    rate = progress * projected + (1 - progress) * baseline
+    return spent + (1 - progress) * rate
+
+
+def category_stats(codes, amounts, n_cats):
+    """Per-category count, mean, population std and median of ``amounts``."""
+    counts = np.bincount(codes, minlength=n_cats)
+    values = amounts.astype(np.float64)
+    safe = np.maximum(counts, 1)
+    mean = np.bincount(codes, weights=values, minlength=n_cats) / safe
+    mean_sq = np.bincount(codes, weights=values * values, minlength=n_cats) / safe
+    std = np.sqrt(np.maximum(mean_sq - mean * mean, 0))
+
+    median = np.zeros(n_cats)
+    if len(amounts):
+        ordered = amounts[np.lexsort((amounts, codes))].astype(np.float64)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        last = len(ordered) - 1
+        low = np.clip(starts + (counts - 1) // 2, 0, last)
+        high = np.clip(starts + counts // 2, 0, last)
+        median = np.where(counts > 0, (ordered[low] + ordered[high]) / 2, 0)
+    return counts, mean, std, median
+
+
+def find_anomalies(data):
+    """Indices of expenses far above their category's typical amount.
+
+    An expense is flagged when its category has at least ``MIN_HISTORY``
+    expenses and it is either ``Z_THRESHOLD`` standard deviations above the
+    category mean or ``MEDIAN_MULTIPLE`` times the category median. The
+    median rule catches outliers in short histories, where one large value
+    inflates the standard deviation too much for its z-score to stand out.
+    """
+    counts, mean, std, median = category_stats(data.codes, data.amounts, len(data.category_ids))
+    codes = data.codes
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(std[codes] > 0, (data.amounts - mean[codes]) / std[codes], 0)
+    flagged = (counts[codes] >= MIN_HISTORY) & (
+        (z >= Z_THRESHOLD) | ((median[codes] > 0) & (data.amounts >= MEDIAN_MULTIPLE * median[codes]))
+    )
+    return np.flatnonzero(flagged), z, median
+
+
+def spending_report(data, today, budgets=None):
+    """Monthly totals, month-end forecasts and anomalies, ready for JSON.
+
+    ``budgets`` maps category id to the available budget in ``data.currency``
+    minor units; forecasts for those categories say whether they will
+    exceed it. Amounts are returned in major units.
+    """
+    digits = minor_units(data.currency)
+    scale = 10 ** digits
+    budgets = budgets or {}
+    current = today.year * 12 + today.month - 1 - 1970 * 12
+    starts = [m.min() for m in (data.months, data.summary_months) if len(m)]
+    # Clamped to ``current`` because expenses may be dated in future months
+    first = min(max(min(starts), current - HISTORY_MONTHS), current) if starts else current
+    matrix = monthly_totals(data, first, current)
+
+    history = matrix[:-1]
+    spent = matrix[-1].astype(np.float64)
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    # Without history the forecast is the plain run-rate projection
+    baseline = rolling_mean(history, ROLLING_MONTHS)[-1] if len(history) else spent * days_in_month / today.day
+    forecast = forecast_month_end(spent, baseline, today.day, days_in_month)
+
+    forecasts = []
+    for code in np.flatnonzero((spent > 0) | (baseline > 0)):
+        category = int(data.category_ids[code])
+        entry = {
+            'category_id': category,
+            'category': get_category(category).label,
+            'spent': round(spent[code] / scale, digits),
+            'rolling_mean': round(baseline[code] / scale, digits),
+            'forecast': round(forecast[code] / scale, digits),
+        }
+        if category in budgets:
+            entry['budget'] = round(budgets[category] / scale, digits)
+            entry['over_budget'] = bool(forecast[code] > budgets[category])
+        forecasts.append(entry)
+
+    flagged, z, median = find_anomalies(data)
+    anomalies = [
+        {
+            'id': int(data.ids[i]),
+            'date': str(np.datetime64(int(data.days[i]), 'D')),
+            'category': get_category(int(data.category_ids[data.codes[i]])).label,
+            'amount': round(data.amounts[i] / scale, digits),
+            'typical': round(median[data.codes[i]] / scale, digits),
+            'multiple': round(float(data.amounts[i] / median[data.codes[i]]), 1) if median[data.codes[i]] else None,
+            'z_score': round(float(z[i]), 2),
+        }
+        for i in flagged[::-1][:MAX_ANOMALIES]
+    ]
+
+    return {
+        'currency': data.currency,
+        'months': [str(np.datetime64(int(m), 'M')) for m in range(first, current + 1)],
+        'categories': [get_category(int(c)).label for c in data.category_ids],
+        'monthly': (matrix.T / scale).round(digits).tolist(),
+        'forecasts': forecasts,
+        'anomalies': anomalies,
+    }
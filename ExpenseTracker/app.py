@@ -5,6 +5,8 @@ from flask import Flask, session, request, jsonify
 from markupsafe import Markup
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from currency import CURRENCY_OPTIONS, get_formatter, current_formatter
+from money import Money
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -29,6 +31,10 @@ if not database_url or "neondb_owner" in database_url:
     
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Expenses older than this many whole months move to the archive (see archive.py)
+app.config['ARCHIVE_AFTER_MONTHS'] = int(os.environ.get('ARCHIVE_AFTER_MONTHS', '12'))
+# HTML/JSON responses at least this large are gzip/brotli compressed (see assets.py)
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
 
 if database_url.startswith("postgresql://"):
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
@@ -50,69 +56,41 @@ def load_user(user_id):
     return User.query.get(int(user_id))
 
 
-# Jinja filter to format amounts in Indian Rupee style (₹ and Indian grouping)
-# Supported currencies (symbol + locale)
-CURRENCY_OPTIONS = {
-    'INR': {'symbol': '&#8377;', 'locale': 'en-IN'},
-    'USD': {'symbol': '$', 'locale': 'en-US'},
-    'EUR': {'symbol': '€', 'locale': 'de-DE'},
-    'GBP': {'symbol': '£', 'locale': 'en-GB'},
-    'JPY': {'symbol': '¥', 'locale': 'ja-JP'},
-    'AUD': {'symbol': '$', 'locale': 'en-AU'},
-}
-
-
-def format_currency(value):
-    try:
-        amount = float(value)
-    except Exception:
-        return value
-    # Determine currency code from session or default to INR
-    code = session.get('currency', 'INR')
-    # Special-case INR to use Indian-style grouping
-    negative = amount < 0
-    amount = abs(amount)
-
-    if code == 'INR':
-        whole = int(amount)
-        fraction = int(round((amount - whole) * 100))
-
-        whole_str = str(whole)
-        if len(whole_str) > 3:
-            last3 = whole_str[-3:]
-            rest = whole_str[:-3]
-            rest_groups = []
-            while len(rest) > 2:
-                rest_groups.insert(0, rest[-2:])
-                rest = rest[:-2]
-            if rest:
-                rest_groups.insert(0, rest)
-            formatted_whole = ','.join(rest_groups) + ',' + last3
-        else:
-            formatted_whole = whole_str
-
-        formatted = f"{formatted_whole}.{fraction:02d}"
-        if negative:
-            formatted = f"-{formatted}"
-        symbol = CURRENCY_OPTIONS.get('INR', {}).get('symbol', '&#8377;')
-        return Markup(f"{symbol}{formatted}")
-
-    # Fallback formatting for other currencies (western grouping)
-    formatted = f"{amount:,.2f}"
-    if negative:
-        formatted = f"-{formatted}"
-    symbol = CURRENCY_OPTIONS.get(code, {}).get('symbol', code + ' ')
-    return Markup(f"{symbol}{formatted}")
-
-# Register filter
+# Jinja filters to format amounts (Indian grouping for INR, western otherwise).
+# ``Money`` values carry their own currency; plain numbers use ``code`` or the
+# session's currency.
+def format_currency(value, code=None):
+    if isinstance(value, Money):
+        return get_formatter(value.currency).format_minor(value.minor)
+    formatter = get_formatter(code) if code else current_formatter()
+    return formatter(value)
+
+
+def format_currency_column(values, code=None):
+    values = list(values)
+    if not all(isinstance(value, Money) for value in values):
+        formatter = get_formatter(code) if code else current_formatter()
+        return formatter.format_many(values)
+    # Batch each currency's minor units through its formatter
+    positions = {}
+    for i, value in enumerate(values):
+        positions.setdefault(value.currency, []).append(i)
+    out = [None] * len(values)
+    for currency, indexes in positions.items():
+        formatted = get_formatter(currency).format_many_minor(values[i].minor for i in indexes)
+        for i, text in zip(indexes, formatted):
+            out[i] = text
+    return out
+
+# Register filters
 app.jinja_env.filters['currency'] = format_currency
+app.jinja_env.filters['currency_column'] = format_currency_column
 
 
 @app.context_processor
 def inject_currency():
-    code = session.get('currency', 'INR')
-    symbol = CURRENCY_OPTIONS.get(code, {}).get('symbol', '')
-    return dict(current_currency=code, current_currency_symbol=Markup(symbol))
+    formatter = current_formatter()
+    return dict(current_currency=formatter.code, current_currency_symbol=Markup(formatter.symbol))
 
 
 @app.route('/set_currency', methods=['POST'])
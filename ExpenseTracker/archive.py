@@ -0,0 +1,139 @@
+"""Hot/cold storage for old expenses.
+
+Expenses older than ``ARCHIVE_AFTER_MONTHS`` whole months are moved out of
+the ``expense`` table into append-only ``ExpenseArchive`` batches (one
+zlib-compressed JSON blob per user, month and archival run). Their totals
+are folded into ``MonthlySummary`` so dashboards stay correct without
+reading the archive. Listing views call ``archived_expenses`` which only
+touches batches whose month falls inside the requested date range.
+"""
+import json
+import zlib
+from datetime import date, datetime
+
+from app import db
+from categories import category_id
+from models import Expense, ExpenseArchive, MonthlySummary
+from money import Money
+
+DELETE_CHUNK = 500
+
+
+class ArchivedExpense:
+    """Read-only stand-in for an ``Expense`` restored from the archive."""
+
+    __slots__ = ('id', 'date', 'category_id', 'currency', 'amount', 'description')
+    archived = True
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.date = date.fromisoformat(row['date'])
+        # Batches written before categories were normalized hold the slug
+        self.category_id = row['category_id'] if 'category_id' in row else category_id(row['category'])
+        self.currency = row['currency']
+        self.amount = Money(row['amount'], row['currency'])
+        self.description = row['description']
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def cutoff_date(today, months):
+    """First day of the month ``months`` whole months before ``today``'s month."""
+    index = today.year * 12 + today.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def archive_expenses(before, user_id=None):
+    """Move expenses dated before ``before`` into the archive.
+
+    Returns the number of expenses archived. Nothing is committed; callers
+    commit once so rows are never both archived and live.
+    """
+    query = db.session.query(
+        Expense.id, Expense.user_id, Expense.date, Expense.category_id, Expense.currency,
+        Expense.amount_minor, Expense.description, Expense.created_at,
+    ).filter(Expense.date < before)
+    if user_id is not None:
+        query = query.filter(Expense.user_id == user_id)
+
+    batches = {}
+    totals = {}
+    ids = []
+    for row in query.order_by(Expense.user_id, Expense.date, Expense.id):
+        month = month_start(row.date)
+        batches.setdefault((row.user_id, month), []).append({
+            'id': row.id,
+            'date': row.date.isoformat(),
+            'category_id': row.category_id,
+            'currency': row.currency,
+            'amount': row.amount_minor,
+            'description': row.description,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+        })
+        key = (row.user_id, month, row.category_id, row.currency)
+        amount, count = totals.get(key, (0, 0))
+        totals[key] = (amount + row.amount_minor, count + 1)
+        ids.append(row.id)
+    if not ids:
+        return 0
+
+    now = datetime.utcnow()
+    db.session.add_all(
+        ExpenseArchive(
+            user_id=uid, month=month, row_count=len(rows), created_at=now,
+            payload=zlib.compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'), 9),
+        )
+        for (uid, month), rows in batches.items()
+    )
+    _add_to_summaries(totals)
+    for i in range(0, len(ids), DELETE_CHUNK):
+        Expense.query.filter(Expense.id.in_(ids[i:i + DELETE_CHUNK])).delete(synchronize_session=False)
+    return len(ids)
+
+
+def _add_to_summaries(totals):
+    users = {key[0] for key in totals}
+    months = {key[1] for key in totals}
+    existing = {
+        (s.user_id, s.month, s.category_id, s.currency): s
+        for s in MonthlySummary.query.filter(MonthlySummary.user_id.in_(users), MonthlySummary.month.in_(months))
+    }
+    for key, (amount, count) in totals.items():
+        summary = existing.get(key)
+        if summary is None:
+            uid, month, cat_id, currency = key
+            db.session.add(MonthlySummary(
+                user_id=uid, month=month, category_id=cat_id, currency=currency,
+                amount_minor=amount, expense_count=count,
+            ))
+        else:
+            summary.amount_minor += amount
+            summary.expense_count += count
+
+
+def archived_expenses(user_id, start=None, end=None, category=None):
+    """Archived expenses for ``user_id`` within ``start``..``end`` (inclusive),
+    optionally only those with category id ``category``.
+
+    Only batches for months overlapping the range are read and decompressed,
+    so recent date ranges never touch the archive's payloads.
+    """
+    query = db.session.query(ExpenseArchive.payload).filter(ExpenseArchive.user_id == user_id)
+    if start:
+        query = query.filter(ExpenseArchive.month >= month_start(start))
+    if end:
+        query = query.filter(ExpenseArchive.month <= end)
+    results = []
+    for (payload,) in query:
+        for row in json.loads(zlib.decompress(payload)):
+            expense = ArchivedExpense(row)
+            if start and expense.date < start:
+                continue
+            if end and expense.date > end:
+                continue
+            if category and expense.category_id != category:
+                continue
+            results.append(expense)
+    return results
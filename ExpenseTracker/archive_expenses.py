@@ -0,0 +1,39 @@
+"""Move old expenses into the compressed archive.
+
+Usage: python archive_expenses.py [--months N] [--user ID] [--dry-run]
+
+Defaults to the app's ARCHIVE_AFTER_MONTHS setting. Safe to run from cron;
+each run appends new batches and never rewrites existing ones.
+"""
+import argparse
+from datetime import date
+
+from app import app, db
+from archive import archive_expenses, cutoff_date
+from models import Expense
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive expenses older than a number of whole months.')
+    parser.add_argument('--months', type=int, default=None,
+                        help='keep this many whole months hot (default: ARCHIVE_AFTER_MONTHS)')
+    parser.add_argument('--user', type=int, default=None, help='only archive this user id')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be archived')
+    args = parser.parse_args()
+
+    with app.app_context():
+        months = args.months if args.months is not None else app.config['ARCHIVE_AFTER_MONTHS']
+        before = cutoff_date(date.today(), months)
+        if args.dry_run:
+            query = Expense.query.filter(Expense.date < before)
+            if args.user is not None:
+                query = query.filter(Expense.user_id == args.user)
+            print(f"{query.count()} expenses dated before {before} would be archived.")
+            return
+        archived = archive_expenses(before, args.user)
+        db.session.commit()
+        print(f"Archived {archived} expenses dated before {before}.")
+
+
+if __name__ == '__main__':
+    main()
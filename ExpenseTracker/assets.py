@@ -0,0 +1,173 @@
+"""Fingerprinted, precompressed static assets and response compression.
+
+Every file under ``static/`` is hashed once and gets a content-addressed URL
+such as ``/assets/css/style.3f2a9c1b.css`` (templates call ``asset_url``).
+Because the URL changes whenever the file does, those responses are cached
+by browsers for a year as ``immutable``. Brotli and gzip bodies are built
+once in memory and picked per request from ``Accept-Encoding``.
+
+``AssetMiddleware`` answers ``/assets/`` requests in front of the Flask app,
+so no session or login handling runs for them and the responses never get
+``Vary: Cookie`` (which would make browsers refetch them after every
+session change).
+
+HTML and JSON responses larger than ``COMPRESS_MIN_SIZE`` bytes are
+compressed on the way out by ``compress_response``.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+import brotli
+from flask import request
+from werkzeug.wrappers import Request, Response
+
+from app import app
+
+ASSET_PREFIX = '/assets/'
+ASSET_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+COMPRESSED_RESPONSES = ('text/html', 'application/json')
+
+
+class Asset:
+    """One static file with its fingerprinted URL path and encoded bodies."""
+
+    __slots__ = ('filename', 'path', 'mtime', 'mimetype', 'etag', 'url_path', 'bodies')
+
+    def __init__(self, filename, path):
+        self.filename = filename
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        self.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        self.etag = hashlib.sha256(data).hexdigest()[:16]
+        stem, ext = os.path.splitext(filename)
+        self.url_path = f"{stem}.{self.etag[:8]}{ext}"
+        # Smallest encodings first so negotiation can stop at the first acceptable one
+        self.bodies = {}
+        if self.mimetype.startswith(COMPRESSIBLE):
+            self._keep('br', brotli.compress(data, quality=11), len(data))
+            self._keep('gzip', gzip.compress(data, 9, mtime=0), len(data))
+        self.bodies['identity'] = data
+
+    def _keep(self, encoding, body, original_size):
+        if len(body) < original_size:
+            self.bodies[encoding] = body
+
+
+class AssetRegistry:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._by_name = {}
+        self._by_url = {}
+        self.build()
+
+    def build(self):
+        by_name = {}
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(folder, name)
+                filename = os.path.relpath(path, self.root).replace(os.sep, '/')
+                by_name[filename] = Asset(filename, path)
+        with self._lock:
+            self._by_name = by_name
+            self._by_url = {asset.url_path: asset for asset in by_name.values()}
+
+    def get(self, filename):
+        asset = self._by_name.get(filename)
+        # While developing, pick up edits without a restart
+        if app.debug and (asset is None or _changed(asset)):
+            self.build()
+            asset = self._by_name.get(filename)
+        return asset
+
+    def by_url(self, url_path):
+        return self._by_url.get(url_path)
+
+
+def _changed(asset):
+    try:
+        return os.stat(asset.path).st_mtime_ns != asset.mtime
+    except FileNotFoundError:
+        return True
+
+
+registry = AssetRegistry(app.static_folder)
+
+
+@app.template_global()
+def asset_url(filename):
+    """Fingerprinted URL for ``static/<filename>``; falls back to the plain static URL."""
+    asset = registry.get(filename)
+    if asset is None:
+        return f"{app.static_url_path}/{filename}"
+    return f"{ASSET_PREFIX}{asset.url_path}"
+
+
+def _negotiate(bodies, accepted):
+    for encoding in bodies:
+        if encoding == 'identity' or accepted[encoding]:
+            return encoding
+    return 'identity'
+
+
+def serve_asset(environ):
+    """Response for a fingerprinted asset URL, or 404."""
+    req = Request(environ)
+    asset = registry.by_url(req.path[len(ASSET_PREFIX):])
+    if asset is None or req.method not in ('GET', 'HEAD'):
+        return Response('Not Found', status=404, mimetype='text/plain')
+    encoding = _negotiate(asset.bodies, req.accept_encodings)
+    response = Response(asset.bodies[encoding], mimetype=asset.mimetype)
+    response.cache_control.public = True
+    response.cache_control.max_age = ASSET_MAX_AGE
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding != 'identity':
+        response.content_encoding = encoding
+    response.set_etag(asset.etag if encoding == 'identity' else f"{asset.etag}-{encoding}")
+    return response.make_conditional(req)
+
+
+class AssetMiddleware:
+    """Serve ``/assets/`` directly and pass everything else to ``wsgi_app``."""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(ASSET_PREFIX):
+            return serve_asset(environ)(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+
+app.wsgi_app = AssetMiddleware(app.wsgi_app)
+
+
+@app.after_request
+def compress_response(response):
+    """Compress large HTML and JSON responses the client accepts compressed."""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSED_RESPONSES):
+        return response
+    body = response.get_data()
+    if len(body) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if accepted['br']:
+        encoding, compressed = 'br', brotli.compress(body, quality=5)
+    elif accepted['gzip']:
+        encoding, compressed = 'gzip', gzip.compress(body, 6)
+    else:
+        return response
+    response.set_data(compressed)
+    response.content_encoding = encoding
+    return response
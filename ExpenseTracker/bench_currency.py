@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark the compiled currency formatters against the old per-call filter.
+
+Usage: python bench_currency.py [--rows 5000] [--repeat 5]
+"""
+import argparse
+import random
+import timeit
+
+from flask import session
+from markupsafe import Markup
+
+from app import app, format_currency, format_currency_column
+from currency import CURRENCY_OPTIONS
+from money import Money
+
+
+def legacy_format_currency(value):
+    """The original ``currency`` filter, kept here as the baseline."""
+    try:
+        amount = float(value)
+    except Exception:
+        return value
+    code = session.get('currency', 'INR')
+    negative = amount < 0
+    amount = abs(amount)
+
+    if code == 'INR':
+        whole = int(amount)
+        fraction = int(round((amount - whole) * 100))
+
+        whole_str = str(whole)
+        if len(whole_str) > 3:
+            last3 = whole_str[-3:]
+            rest = whole_str[:-3]
+            rest_groups = []
+            while len(rest) > 2:
+                rest_groups.insert(0, rest[-2:])
+                rest = rest[:-2]
+            if rest:
+                rest_groups.insert(0, rest)
+            formatted_whole = ','.join(rest_groups) + ',' + last3
+        else:
+            formatted_whole = whole_str
+
+        formatted = f"{formatted_whole}.{fraction:02d}"
+        if negative:
+            formatted = f"-{formatted}"
+        symbol = CURRENCY_OPTIONS.get('INR', {}).get('symbol', '&#8377;')
+        return Markup(f"{symbol}{formatted}")
+
+    formatted = f"{amount:,.2f}"
+    if negative:
+        formatted = f"-{formatted}"
+    symbol = CURRENCY_OPTIONS.get(code, {}).get('symbol', code + ' ')
+    return Markup(f"{symbol}{formatted}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    amounts = [round(rng.uniform(1, 2_500_000), 2) for _ in range(args.rows)]
+
+    print(f"Formatting {args.rows} amounts, best of {args.repeat} runs")
+    print(f"{'currency':<8} {'legacy':>10} {'per-call':>10} {'column':>10} {'minor':>10} {'speedup':>8}")
+    for code in ('INR', 'USD'):
+        monies = [Money.parse(a, code) for a in amounts]
+        with app.test_request_context():
+            session['currency'] = code
+            timings = {
+                'legacy': lambda: [legacy_format_currency(a) for a in amounts],
+                'per-call': lambda: [format_currency(a) for a in amounts],
+                'column': lambda: format_currency_column(amounts),
+                'minor': lambda: format_currency_column(monies),
+            }
+            best = {name: min(timeit.repeat(fn, number=1, repeat=args.repeat)) for name, fn in timings.items()}
+        print(f"{code:<8} {best['legacy'] * 1000:>8.2f}ms {best['per-call'] * 1000:>8.2f}ms "
+              f"{best['column'] * 1000:>8.2f}ms {best['minor'] * 1000:>8.2f}ms "
+              f"{best['legacy'] / min(best['column'], best['minor']):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Spending categories.
+
+Categories live in the ``category`` table and rows reference them by a small
+integer id. Rows with a ``user_id`` are that user's custom categories; the
+rest are shared defaults seeded by ``migrate_db.py``. The table is tiny and
+rarely changes, so it is cached per process. Once per request the cache is
+checked against ``count(id)`` and ``max(id)`` of the table and reloaded if a
+category was added or removed (for example by another worker); a miss on
+an id or slug also reloads it.
+"""
+import re
+import threading
+from collections import namedtuple
+
+from flask import g, has_request_context
+from flask_login import current_user
+from sqlalchemy import func
+
+from app import app, db
+
+# (slug, label, Font Awesome icon); ids follow this order on a fresh database
+DEFAULT_CATEGORIES = [
+    ('food', 'Food & Dining', 'utensils'),
+    ('transportation', 'Transportation', 'car'),
+    ('entertainment', 'Entertainment', 'film'),
+    ('utilities', 'Utilities', 'bolt'),
+    ('housing', 'Housing', 'home'),
+    ('healthcare', 'Healthcare', 'heartbeat'),
+    ('shopping', 'Shopping', 'shopping-bag'),
+    ('education', 'Education', 'graduation-cap'),
+    ('personal', 'Personal Care', 'user'),
+    ('travel', 'Travel', 'plane'),
+    ('subscription', 'Subscription', 'sync'),
+    ('other', 'Other', 'tag'),
+]
+
+CategoryInfo = namedtuple('CategoryInfo', 'id slug label icon user_id')
+UNKNOWN = CategoryInfo(None, 'unknown', 'Unknown', 'tag', None)
+
+_lock = threading.Lock()
+_by_id = None
+_version = None
+
+
+def _table_version():
+    from models import Category
+    return tuple(db.session.query(func.count(Category.id), func.max(Category.id)).one())
+
+
+def _categories(refresh=False):
+    global _by_id, _version
+    # One version check per request keeps every worker's cache current
+    if not refresh and has_request_context() and 'categories_version' not in g:
+        g.categories_version = _table_version()
+        refresh = g.categories_version != _version
+    with _lock:
+        if _by_id is None or refresh:
+            from models import Category
+            rows = db.session.query(
+                Category.id, Category.slug, Category.label, Category.icon, Category.user_id
+            ).order_by(Category.id)
+            _by_id = {row.id: CategoryInfo(*row) for row in rows}
+            _version = (len(_by_id), max(_by_id, default=None))
+        return _by_id
+
+
+def invalidate():
+    """Drop the cached table; call after committing a new or changed category."""
+    global _by_id, _version
+    with _lock:
+        _by_id = _version = None
+
+
+@app.template_global('category')
+def get_category(category_id):
+    """``CategoryInfo`` for ``category_id``; ``UNKNOWN`` if there is no such row."""
+    found = _categories().get(category_id)
+    if found is None and category_id is not None:
+        found = _categories(refresh=True).get(category_id)
+    return found or UNKNOWN
+
+
+def user_categories(user_id):
+    """Shared categories followed by ``user_id``'s custom ones, in id order."""
+    return [c for c in _categories().values() if c.user_id is None or c.user_id == user_id]
+
+
+@app.template_global()
+def category_choices():
+    """``(id, label)`` pairs for the signed-in user's category select boxes."""
+    user_id = current_user.id if current_user.is_authenticated else None
+    return [(c.id, c.label) for c in user_categories(user_id)]
+
+
+def category_id(slug, user_id=None):
+    """Id of ``slug`` as seen by ``user_id`` (their own category wins), or None."""
+    for refresh in (False, True):
+        matches = {c.user_id: c.id for c in _categories(refresh).values()
+                   if c.slug == slug and c.user_id in (None, user_id)}
+        if matches:
+            return matches.get(user_id, matches.get(None))
+    return None
+
+
+def slugify(label):
+    return re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-')[:30]
@@ -0,0 +1,136 @@
+"""Currency formatting helpers.
+
+One ``CurrencyFormatter`` is compiled per entry in ``CURRENCY_OPTIONS`` at
+import time, so the hot path in templates is a dict lookup plus a couple of
+string operations instead of re-deriving symbol, grouping and precision for
+every amount.
+"""
+from flask import g, session
+from markupsafe import Markup
+
+DEFAULT_CURRENCY = 'INR'
+
+# Supported currencies (symbol + locale). ``minor_units`` is the number of
+# decimal places the currency is written with (ISO 4217 exponent).
+CURRENCY_OPTIONS = {
+    'INR': {'symbol': '&#8377;', 'locale': 'en-IN', 'minor_units': 2, 'grouping': 'indian'},
+    'USD': {'symbol': '$', 'locale': 'en-US', 'minor_units': 2},
+    'EUR': {'symbol': '€', 'locale': 'de-DE', 'minor_units': 2},
+    'GBP': {'symbol': '£', 'locale': 'en-GB', 'minor_units': 2},
+    'JPY': {'symbol': '¥', 'locale': 'ja-JP', 'minor_units': 0},
+    'AUD': {'symbol': '$', 'locale': 'en-AU', 'minor_units': 2},
+}
+
+
+def minor_units(code):
+    """Number of decimal places ``code`` is written with."""
+    return CURRENCY_OPTIONS.get(code, {}).get('minor_units', 2)
+
+
+def _group_indian(digits):
+    # 12345678 -> 1,23,45,678: last three digits, then pairs
+    n = len(digits)
+    if n <= 3:
+        return digits
+    if n <= 5:
+        return digits[:-3] + ',' + digits[-3:]
+    if n <= 7:
+        return digits[:-5] + ',' + digits[-5:-3] + ',' + digits[-3:]
+    head, tail = digits[:-3], digits[-3:]
+    lead = len(head) % 2
+    parts = [head[:lead]] if lead else []
+    parts.extend(head[i:i + 2] for i in range(lead, len(head), 2))
+    parts.append(tail)
+    return ','.join(parts)
+
+
+class CurrencyFormatter:
+    """Formats amounts for a single currency.
+
+    Call the instance with one major-unit amount, use ``format_minor`` for
+    exact integer minor units, or the ``format_many*`` variants to format a
+    whole column in one pass.
+    """
+
+    __slots__ = ('code', 'symbol', 'minor_units', '_spec', '_indian', '_fraction_len', '_scale', '_fraction')
+
+    def __init__(self, code, options):
+        self.code = code
+        self.symbol = options.get('symbol', code + ' ')
+        self.minor_units = options.get('minor_units', 2)
+        self._indian = options.get('grouping') == 'indian'
+        # format() rounds correctly from the binary value; the Indian
+        # variant regroups the whole part afterwards.
+        self._spec = f".{self.minor_units}f" if self._indian else f",.{self.minor_units}f"
+        self._fraction_len = self.minor_units + 1 if self.minor_units else 0
+        self._scale = 10 ** self.minor_units
+        self._fraction = f".{{:0{self.minor_units}d}}" if self.minor_units else ''
+
+    def _text(self, amount):
+        text = format(amount, self._spec)
+        start = 1 if text[0] == '-' else 0
+        if start and not text.strip('-0.,'):
+            # Don't show "-0.00" for amounts that round to zero
+            text = text[1:]
+            start = 0
+        if self._indian:
+            end = len(text) - self._fraction_len
+            if end - start > 3:
+                text = text[:start] + _group_indian(text[start:end]) + text[end:]
+        return self.symbol + text
+
+    def _minor_text(self, minor):
+        whole, fraction = divmod(abs(minor), self._scale)
+        text = _group_indian(str(whole)) if self._indian else f"{whole:,}"
+        text += self._fraction.format(fraction)
+        return self.symbol + ('-' + text if minor < 0 else text)
+
+    def __call__(self, value):
+        try:
+            amount = float(value)
+        except (TypeError, ValueError):
+            return value
+        return Markup(self._text(amount))
+
+    def format_many(self, values):
+        """Format an iterable of amounts, returning a list of ``Markup``."""
+        text = self._text
+        out = []
+        for value in values:
+            try:
+                out.append(Markup(text(float(value))))
+            except (TypeError, ValueError):
+                out.append(value)
+        return out
+
+    def format_minor(self, minor):
+        """Format an integer amount of minor units exactly."""
+        return Markup(self._minor_text(minor))
+
+    def format_many_minor(self, minors):
+        text = self._minor_text
+        return [Markup(text(minor)) for minor in minors]
+
+
+FORMATTERS = {code: CurrencyFormatter(code, opts) for code, opts in CURRENCY_OPTIONS.items()}
+
+
+def get_formatter(code):
+    """Return the compiled formatter for ``code``, building one for unknown codes."""
+    formatter = FORMATTERS.get(code)
+    if formatter is None:
+        formatter = FORMATTERS[code] = CurrencyFormatter(code, {})
+    return formatter
+
+
+def current_currency():
+    """Currency code the user has chosen to view amounts in."""
+    return session.get('currency', DEFAULT_CURRENCY)
+
+
+def current_formatter():
+    """Formatter for the session's currency, resolved once per request."""
+    formatter = g.get('currency_formatter')
+    if formatter is None:
+        formatter = g.currency_formatter = get_formatter(current_currency())
+    return formatter
@@ -1,28 +1,41 @@
 from flask_wtf import FlaskForm
-from wtforms import FloatField, StringField, DateField, TextAreaField, SelectField, PasswordField, BooleanField
+from wtforms import DecimalField, StringField, DateField, TextAreaField, SelectField, PasswordField, BooleanField
 from wtforms.validators import DataRequired, NumberRange, Email, EqualTo, Length, ValidationError
 from models import User
+from currency import CURRENCY_OPTIONS
+from categories import category_choices
+from money import Money
+
+
+# Far below the BIGINT limit in minor units for every supported currency,
+# so totals and rollovers built from these amounts can't overflow either
+MAX_AMOUNT = 10 ** 12
+
+
+class MoneyField(DecimalField):
+    """Decimal input that converts to exact ``Money`` in a given currency."""
+
+    def __init__(self, label=None, validators=None, **kwargs):
+        validators = list(validators or []) + [
+            NumberRange(max=MAX_AMOUNT, message=f"Amount must be at most {MAX_AMOUNT:,}")
+        ]
+        super().__init__(label, validators, **kwargs)
+
+    def money(self, currency):
+        return Money.parse(self.data, currency)
+
 
 class ExpenseForm(FlaskForm):
     """Form for adding and editing expenses"""
-    amount = FloatField('Amount', validators=[
+    amount = MoneyField('Amount', validators=[
         DataRequired(message="Please enter an amount"),
         NumberRange(min=0.01, message="Amount must be greater than 0")
     ])
     
-    category = SelectField('Category', validators=[DataRequired()], choices=[
-        ('food', 'Food & Dining'),
-        ('transportation', 'Transportation'),
-        ('entertainment', 'Entertainment'),
-        ('utilities', 'Utilities'),
-        ('housing', 'Housing'),
-        ('healthcare', 'Healthcare'),
-        ('shopping', 'Shopping'),
-        ('education', 'Education'),
-        ('personal', 'Personal Care'),
-        ('travel', 'Travel'),
-        ('other', 'Other')
-    ])
+    currency = SelectField('Currency', validators=[DataRequired()],
+                           choices=[(code, code) for code in CURRENCY_OPTIONS])
+    
+    category = SelectField('Category', validators=[DataRequired()], coerce=int, choices=category_choices)
     
     date = DateField('Date', validators=[DataRequired(message="Please enter a valid date")])
     
@@ -73,44 +86,30 @@ class RegistrationForm(FlaskForm):
 
 
 class BudgetForm(FlaskForm):
-    category = SelectField('Category', validators=[DataRequired()], choices=[
-        ('food', 'Food & Dining'),
-        ('transportation', 'Transportation'),
-        ('entertainment', 'Entertainment'),
-        ('utilities', 'Utilities'),
-        ('housing', 'Housing'),
-        ('healthcare', 'Healthcare'),
-        ('shopping', 'Shopping'),
-        ('education', 'Education'),
-        ('personal', 'Personal Care'),
-        ('travel', 'Travel'),
-        ('other', 'Other')
-    ])
-    amount = FloatField('Monthly Amount', validators=[DataRequired(), NumberRange(min=0.0)])
+    category = SelectField('Category', validators=[DataRequired()], coerce=int, choices=category_choices)
+    amount = MoneyField('Monthly Amount', validators=[DataRequired(), NumberRange(min=0.0)])
     rollover = BooleanField('Allow rollover of unused funds')
 
 
 class RecurringForm(FlaskForm):
-    amount = FloatField('Amount', validators=[DataRequired(), NumberRange(min=0.0)])
-    category = SelectField('Category', validators=[DataRequired()], choices=[
-        ('housing', 'Housing'),
-        ('utilities', 'Utilities'),
-        ('subscription', 'Subscription'),
-        ('other', 'Other')
-    ])
+    amount = MoneyField('Amount', validators=[DataRequired(), NumberRange(min=0.0)])
+    category = SelectField('Category', validators=[DataRequired()], coerce=int, choices=category_choices)
     description = StringField('Description', validators=[Length(max=200)])
     day_of_month = SelectField('Day of month', coerce=int, choices=[(i, str(i)) for i in range(1,29)])
 
 
 class GoalForm(FlaskForm):
     name = StringField('Goal name', validators=[DataRequired(), Length(max=120)])
-    target_amount = FloatField('Target amount', validators=[DataRequired(), NumberRange(min=0.01)])
+    target_amount = MoneyField('Target amount', validators=[DataRequired(), NumberRange(min=0.01)])
+
+
+CONTRIBUTION_SOURCES = [
+    ('wants', 'Wants'),
+    ('savings', 'Savings'),
+    ('other', 'Other')
+]
 
 
 class ContributionForm(FlaskForm):
-    amount = FloatField('Amount', validators=[DataRequired(), NumberRange(min=0.01)])
-    source_category = SelectField('From category', validators=[DataRequired()], choices=[
-        ('wants', 'Wants'),
-        ('savings', 'Savings'),
-        ('other', 'Other')
-    ])
+    amount = MoneyField('Amount', validators=[DataRequired(), NumberRange(min=0.01)])
+    source_category = SelectField('From category', validators=[DataRequired()], choices=CONTRIBUTION_SOURCES)
@@ -0,0 +1,78 @@
+"""Offline exchange rates.
+
+Rates come from JSON snapshots in ``data/exchange_rates/`` (override with
+``EXCHANGE_RATES_DIR``); nothing is fetched over the network. Each file looks
+like::
+
+    {"base": "INR", "as_of": "2025-11-14", "rates": {"INR": 1.0, "USD": 0.01127}}
+
+where ``rates[code]`` is how many units of ``code`` one unit of ``base`` buys.
+The snapshot with the latest ``as_of`` wins. Parsed tables are cached until
+the files on disk change.
+"""
+import json
+import os
+from functools import lru_cache
+
+from currency import minor_units
+
+RATES_DIR = os.environ.get(
+    'EXCHANGE_RATES_DIR',
+    os.path.join(os.path.dirname(__file__), 'data', 'exchange_rates'),
+)
+
+
+class RateTable:
+    """A single exchange-rate snapshot with every cross rate precomputed."""
+
+    def __init__(self, base, as_of, rates):
+        self.base = base
+        self.as_of = as_of
+        self.rates = dict(rates)
+        self._cross = {
+            (src, dst): self.rates[dst] / self.rates[src]
+            for src in self.rates for dst in self.rates
+        }
+
+    def rate(self, src, dst):
+        """Units of ``dst`` bought by one unit of ``src``."""
+        if src == dst:
+            return 1.0
+        try:
+            return self._cross[(src, dst)]
+        except KeyError:
+            raise KeyError(f"No exchange rate for {src} -> {dst} (snapshot {self.as_of})")
+
+    def convert_minor(self, minor, src, dst):
+        """Convert an integer minor-unit amount, rounding to the nearest ``dst`` minor unit."""
+        if src == dst:
+            return minor
+        shift = minor_units(dst) - minor_units(src)
+        return int(round(minor * self.rate(src, dst) * 10 ** shift))
+
+
+def _snapshot_files(directory):
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith('.json'))
+    except FileNotFoundError:
+        return ()
+    return tuple((n, os.stat(os.path.join(directory, n)).st_mtime_ns) for n in names)
+
+
+@lru_cache(maxsize=4)
+def _load(directory, files):
+    latest = None
+    for name, _ in files:
+        with open(os.path.join(directory, name), encoding='utf-8') as fh:
+            snapshot = json.load(fh)
+        if latest is None or snapshot['as_of'] > latest['as_of']:
+            latest = snapshot
+    if latest is None:
+        raise FileNotFoundError(f"No exchange-rate snapshots found in {directory}")
+    return RateTable(latest['base'], latest['as_of'], latest['rates'])
+
+
+def rate_table(directory=None):
+    """Return the current ``RateTable``, reloading only if the files changed."""
+    directory = directory or RATES_DIR
+    return _load(directory, _snapshot_files(directory))
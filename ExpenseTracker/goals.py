@@ -0,0 +1,61 @@
+"""Savings-goal contributions.
+
+Contributions are written to the ``GoalContribution`` ledger and added to
+``SavingsGoal.current_amount`` with ``UPDATE ... SET current_amount =
+current_amount + :delta``, so concurrent requests can't overwrite each
+other's totals and the goal row is only locked for the length of the
+UPDATE and commit.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, insert, update
+
+from app import db
+from models import GoalContribution, SavingsGoal
+
+
+class GoalAccessError(LookupError):
+    """A contribution named a goal that doesn't exist or isn't the user's."""
+
+
+def record_contributions(user_id, contributions):
+    """Add contributions to the user's goals in one statement per table.
+
+    ``contributions`` is an iterable of ``(goal_id, Money, source_category)``
+    with each amount already in its goal's currency. Nothing is committed;
+    if any goal isn't owned by ``user_id`` a ``GoalAccessError`` is raised
+    and the caller should roll back.
+    """
+    now = datetime.utcnow()
+    rows = []
+    deltas = {}
+    for goal_id, amount, source_category in contributions:
+        rows.append({
+            'goal_id': goal_id,
+            'user_id': user_id,
+            'amount_minor': amount.minor,
+            'currency': amount.currency,
+            'source_category': source_category,
+            'created_at': now,
+        })
+        deltas[goal_id] = deltas.get(goal_id, 0) + amount.minor
+    if not rows:
+        return 0
+
+    owned = db.session.query(func.count(SavingsGoal.id)).filter(
+        SavingsGoal.user_id == user_id, SavingsGoal.id.in_(deltas)
+    ).scalar()
+    if owned != len(deltas):
+        raise GoalAccessError('One or more goals were not found')
+
+    goals = SavingsGoal.__table__
+    stmt = (
+        update(goals)
+        .where(goals.c.id == bindparam('goal_pk'), goals.c.user_id == bindparam('owner'))
+        .values(current_amount=func.coalesce(goals.c.current_amount, 0) + bindparam('delta'))
+    )
+    db.session.connection().execute(
+        stmt, [{'goal_pk': goal_id, 'owner': user_id, 'delta': delta} for goal_id, delta in deltas.items()]
+    )
+    db.session.execute(insert(GoalContribution), rows)
+    return len(rows)
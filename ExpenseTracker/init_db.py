@@ -1,9 +1,12 @@
 from app import app, db
 import models  # Import the models to register them
+from migrate_db import upgrade
 
 # Create the application context
 with app.app_context():
     # Create all tables
     print("Creating database tables...")
     db.create_all()
-    print("Database tables created successfully!")
\ No newline at end of file
+    # Bring databases created by older versions up to the current schema
+    upgrade()
+    print("Database tables created successfully!")
@@ -1,5 +1,6 @@
 from app import app
 import routes
+import assets
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,217 @@
+"""Upgrade an existing database in place.
+
+``db.create_all()`` only creates tables that are missing; it never alters
+existing ones. Each step below inspects the live schema first, so the script
+is safe to run repeatedly and on databases created by ``init_db.py``.
+
+Usage: python migrate_db.py
+"""
+from sqlalchemy import BigInteger, Float, MetaData, Table, UniqueConstraint, inspect, text
+from sqlalchemy.schema import AddConstraint, CreateTable
+
+from app import app, db
+from categories import DEFAULT_CATEGORIES
+from currency import CURRENCY_OPTIONS, DEFAULT_CURRENCY
+import models  # Import the models to register them
+
+
+def _columns(conn, table):
+    return {col['name'] for col in inspect(conn).get_columns(table)}
+
+
+def _rebuild_sqlite_table(conn, table, types, exprs):
+    """Recreate ``table`` from its live schema with some column types changed.
+
+    SQLite cannot change a column's type, so this follows its documented
+    recipe: create a new table, copy the rows across (``exprs`` maps a column
+    name to the SQL producing its new value), drop the old table, rename the
+    new one into place and recreate the indexes.
+    """
+    indexes = inspect(conn).get_indexes(table)
+    metadata = MetaData()
+    old = Table(table, metadata, autoload_with=conn)
+    new = old.to_metadata(metadata, name=f'_new_{table}')
+    for name, type_ in types.items():
+        new.c[name].type = type_
+    conn.execute(CreateTable(new))
+    names = [col.name for col in new.columns]
+    columns = ', '.join(f'"{name}"' for name in names)
+    select = ', '.join(exprs.get(name, f'"{name}"') for name in names)
+    conn.execute(text(f'INSERT INTO "_new_{table}" ({columns}) SELECT {select} FROM "{table}"'))
+    conn.execute(text(f'DROP TABLE "{table}"'))
+    conn.execute(text(f'ALTER TABLE "_new_{table}" RENAME TO "{table}"'))
+    for index in indexes:
+        unique = 'UNIQUE ' if index['unique'] else ''
+        columns = ', '.join(f'"{col}"' for col in index['column_names'])
+        conn.execute(text(f'CREATE {unique}INDEX "{index["name"]}" ON "{table}" ({columns})'))
+
+
+def _rebuild_sqlite_table_from_model(conn, model, exprs):
+    """Recreate a table with exactly the model's current columns and constraints.
+
+    For SQLite changes ``_rebuild_sqlite_table`` can't express, such as
+    replacing a column that is part of a constraint. Columns the old and new
+    tables share are copied; ``exprs`` supplies SQL for the new ones.
+    """
+    table = model.name
+    live = _columns(conn, table)
+    metadata = MetaData()
+    for other in db.metadata.sorted_tables:  # so foreign keys resolve
+        other.to_metadata(metadata)
+    new = metadata.tables[table].to_metadata(metadata, name=f'_new_{table}')
+    conn.execute(CreateTable(new))
+    names = [col.name for col in new.columns if col.name in exprs or col.name in live]
+    columns = ', '.join(f'"{name}"' for name in names)
+    select = ', '.join(exprs.get(name, f'"{name}"') for name in names)
+    conn.execute(text(f'INSERT INTO "_new_{table}" ({columns}) SELECT {select} FROM "{table}"'))
+    conn.execute(text(f'DROP TABLE "{table}"'))
+    conn.execute(text(f'ALTER TABLE "_new_{table}" RENAME TO "{table}"'))
+    for index in model.indexes:
+        index.create(conn)
+
+
+def add_currency_columns(conn):
+    """Existing rows were entered in the default (rupee) currency."""
+    for table in ('expense', 'budget', 'recurring_transaction', 'savings_goal'):
+        if 'currency' not in _columns(conn, table):
+            conn.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{DEFAULT_CURRENCY}'"
+            ))
+            print(f"  {table}: added currency column")
+
+
+# Columns that held float major units before amounts became integer minor units
+MONEY_COLUMNS = {
+    'expense': ('amount',),
+    'budget': ('amount', 'rollover_balance'),
+    'recurring_transaction': ('amount',),
+    'savings_goal': ('target_amount', 'current_amount'),
+}
+
+
+def money_to_minor_units(conn):
+    """Rewrite float amounts as exact integers in each row's minor unit."""
+    scale = ' '.join(
+        f"WHEN '{code}' THEN {10 ** opts.get('minor_units', 2)}"
+        for code, opts in CURRENCY_OPTIONS.items()
+    )
+    scale = f"(CASE currency {scale} ELSE 100 END)"
+    for table, money_columns in MONEY_COLUMNS.items():
+        live = {col['name']: col['type'] for col in inspect(conn).get_columns(table)}
+        pending = [name for name in money_columns if isinstance(live[name], Float)]
+        if not pending:
+            continue
+        if conn.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(
+                conn, table,
+                types={name: BigInteger() for name in pending},
+                exprs={name: f'CAST(ROUND("{name}" * {scale}) AS INTEGER)' for name in pending},
+            )
+        else:
+            for name in pending:
+                conn.execute(text(
+                    f'ALTER TABLE {table} ALTER COLUMN {name} TYPE BIGINT USING ROUND({name} * {scale})'
+                ))
+        print(f"  {table}: converted {', '.join(pending)} to integer minor units")
+
+
+def backfill_goal_ledger(conn):
+    """Give goals saved before the ledger existed an opening-balance entry."""
+    result = conn.execute(text(
+        "INSERT INTO goal_contribution (goal_id, user_id, amount, currency, source_category, created_at) "
+        "SELECT id, user_id, current_amount, currency, 'opening balance', CURRENT_TIMESTAMP "
+        "FROM savings_goal WHERE current_amount > 0 "
+        "AND NOT EXISTS (SELECT 1 FROM goal_contribution WHERE goal_contribution.goal_id = savings_goal.id)"
+    ))
+    if result.rowcount:
+        print(f"  goal_contribution: added {result.rowcount} opening balances")
+
+
+def add_expense_updated_at(conn):
+    """Rows that predate the column count as last updated when created."""
+    if 'updated_at' not in _columns(conn, 'expense'):
+        conn.execute(text('ALTER TABLE expense ADD COLUMN updated_at TIMESTAMP'))
+        conn.execute(text('UPDATE expense SET updated_at = created_at'))
+        print("  expense: added updated_at column")
+
+
+# Tables whose category was a free-text slug before the category table existed
+CATEGORY_TABLES = ('expense', 'budget', 'recurring_transaction', 'monthly_summary')
+
+
+def seed_categories(conn):
+    """Add the default categories, plus any other slug the data already uses."""
+    known = {row[0] for row in conn.execute(text('SELECT slug FROM category WHERE user_id IS NULL'))}
+    rows = []
+    for slug, label, icon in DEFAULT_CATEGORIES:
+        if slug not in known:
+            rows.append({'slug': slug, 'label': label, 'icon': icon})
+            known.add(slug)
+    for table in CATEGORY_TABLES:
+        if 'category' not in _columns(conn, table):
+            continue
+        for (slug,) in conn.execute(text(f'SELECT DISTINCT category FROM {table}')):
+            if slug not in known:
+                rows.append({'slug': slug, 'label': slug.replace('_', ' ').title(), 'icon': 'tag'})
+                known.add(slug)
+    if rows:
+        conn.execute(text('INSERT INTO category (slug, label, icon) VALUES (:slug, :label, :icon)'), rows)
+        print(f"  category: added {len(rows)} categories")
+
+
+def categories_to_ids(conn):
+    """Replace category slugs with small-integer ids into the category table."""
+    for table in CATEGORY_TABLES:
+        if 'category' not in _columns(conn, table):
+            continue
+        lookup = (f'(SELECT id FROM category WHERE category.slug = "{table}".category '
+                  f'AND category.user_id IS NULL)')
+        model = db.metadata.tables[table]
+        if conn.dialect.name == 'sqlite':
+            # SQLite can't drop a column that is part of a constraint (monthly_summary's unique key)
+            _rebuild_sqlite_table_from_model(conn, model, {'category_id': lookup})
+        else:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN category_id SMALLINT REFERENCES category (id)'))
+            conn.execute(text(f'UPDATE {table} SET category_id = {lookup}'))
+            conn.execute(text(f'ALTER TABLE {table} ALTER COLUMN category_id SET NOT NULL'))
+            # Dropping the column also drops constraints that include it; re-add the model's
+            conn.execute(text(f'ALTER TABLE {table} DROP COLUMN category'))
+            for constraint in model.constraints:
+                if isinstance(constraint, UniqueConstraint) and 'category_id' in constraint.columns:
+                    conn.execute(AddConstraint(constraint))
+        print(f"  {table}: replaced category with category_id")
+
+
+def create_missing_indexes(conn):
+    """Indexes declared on the models after their table already existed."""
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(conn)
+                print(f"  {table.name}: created index {index.name}")
+
+
+STEPS = [
+    add_currency_columns,
+    money_to_minor_units,
+    backfill_goal_ledger,
+    add_expense_updated_at,
+    seed_categories,
+    categories_to_ids,
+    create_missing_indexes,
+]
+
+
+def upgrade():
+    db.create_all()
+    with db.engine.begin() as conn:
+        for step in STEPS:
+            step(conn)
+
+
+if __name__ == '__main__':
+    with app.app_context():
+        print("Upgrading database schema...")
+        upgrade()
+        print("Database is up to date.")
@@ -2,6 +2,8 @@ from app import db
 from flask_login import UserMixin
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from currency import DEFAULT_CURRENCY
+from money import MoneyAttribute
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -19,23 +21,51 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+class Category(db.Model):
+    """A spending category; ``user_id`` is set for a user's custom categories.
+
+    Rows reference categories by this small integer id. Look them up through
+    ``categories.py``, which caches the whole table.
+    """
+    # SQLite only auto-assigns ids to INTEGER PRIMARY KEY columns
+    id = db.Column(db.SmallInteger().with_variant(db.Integer(), 'sqlite'), primary_key=True)
+    slug = db.Column(db.String(30), nullable=False)
+    label = db.Column(db.String(50), nullable=False)
+    icon = db.Column(db.String(30), nullable=False, default='tag')
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'slug'),)
+
+    def __repr__(self):
+        return f'<Category {self.slug}>'
+
+
 class Expense(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(30), nullable=False)
+    # Money columns hold integer minor units (paise, cents) of ``currency``
+    amount_minor = db.Column('amount', db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    category_id = db.Column(db.SmallInteger, db.ForeignKey('category.id'), nullable=False)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     description = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every edit so analytics can tell when cached arrays are stale
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    amount = MoneyAttribute('amount_minor')
+    # Rows moved to cold storage come back as archive.ArchivedExpense instead
+    archived = False
     
     def __repr__(self):
-        return f'<Expense ₹{self.amount:.2f} - {self.category}>'
+        return f'<Expense {self.currency} {self.amount} - category {self.category_id}>'
     
     def to_dict(self):
         return {
             'id': self.id,
-            'amount': self.amount,
-            'category': self.category,
+            'amount': str(self.amount),
+            'currency': self.currency,
+            'category_id': self.category_id,
             'date': self.date,
             'description': self.description
         }
@@ -44,41 +74,115 @@ class Expense(db.Model):
 class Budget(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    category = db.Column(db.String(30), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    category_id = db.Column(db.SmallInteger, db.ForeignKey('category.id'), nullable=False)
+    amount_minor = db.Column('amount', db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
     rollover = db.Column(db.Boolean, default=False)
-    rollover_balance = db.Column(db.Float, default=0.0)
+    rollover_balance_minor = db.Column('rollover_balance', db.BigInteger, default=0)
+
+    amount = MoneyAttribute('amount_minor')
+    rollover_balance = MoneyAttribute('rollover_balance_minor')
+
+    def available(self):
+        """Monthly amount plus any rolled-over balance, in minor units."""
+        return self.amount_minor + ((self.rollover_balance_minor or 0) if self.rollover else 0)
 
     def __repr__(self):
-        return f'<Budget {self.category} {self.amount} for user {self.user_id}>'
+        return f'<Budget category {self.category_id} {self.amount} for user {self.user_id}>'
 
 
 class RecurringTransaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(30), nullable=False)
+    amount_minor = db.Column('amount', db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    category_id = db.Column(db.SmallInteger, db.ForeignKey('category.id'), nullable=False)
     description = db.Column(db.String(200), nullable=True)
     day_of_month = db.Column(db.Integer, nullable=False)
     active = db.Column(db.Boolean, default=True)
     last_run = db.Column(db.Date, nullable=True)
 
+    amount = MoneyAttribute('amount_minor')
+
     def __repr__(self):
-        return f'<Recurring {self.category} {self.amount} day {self.day_of_month} user {self.user_id}>'
+        return f'<Recurring category {self.category_id} {self.amount} day {self.day_of_month} user {self.user_id}>'
 
 
 class SavingsGoal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     name = db.Column(db.String(120), nullable=False)
-    target_amount = db.Column(db.Float, nullable=False)
-    current_amount = db.Column(db.Float, default=0.0)
+    target_amount_minor = db.Column('target_amount', db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    current_amount_minor = db.Column('current_amount', db.BigInteger, default=0)
+
+    contributions = db.relationship('GoalContribution', backref='goal', lazy='dynamic', cascade="all, delete-orphan")
+
+    target_amount = MoneyAttribute('target_amount_minor')
+    current_amount = MoneyAttribute('current_amount_minor')
 
     def progress_percent(self):
-        try:
-            return min(100, (self.current_amount / self.target_amount) * 100) if self.target_amount else 0
-        except Exception:
+        if not self.target_amount_minor:
             return 0
+        return min(100, (self.current_amount_minor or 0) * 100 / self.target_amount_minor)
+
+    def __repr__(self):
+        return f'<Goal {self.name} {self.current_amount}/{self.target_amount}>'
+
+
+class GoalContribution(db.Model):
+    """Append-only ledger of money added to a savings goal.
+
+    ``SavingsGoal.current_amount`` is a running total of these rows, kept in
+    step by ``goals.record_contributions``.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    goal_id = db.Column(db.Integer, db.ForeignKey('savings_goal.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    amount_minor = db.Column('amount', db.BigInteger, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    source_category = db.Column(db.String(30), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    amount = MoneyAttribute('amount_minor')
+
+    def __repr__(self):
+        return f'<Contribution {self.amount} to goal {self.goal_id}>'
+
+
+class ExpenseArchive(db.Model):
+    """One append-only, compressed batch of archived expenses.
+
+    ``payload`` is zlib-compressed JSON holding every expense a single
+    archival run moved out of ``expense`` for one user and month; see
+    ``archive.py``.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_expense_archive_user_month', 'user_id', 'month'),)
+
+    def __repr__(self):
+        return f'<ExpenseArchive user {self.user_id} {self.month:%Y-%m} ({self.row_count} rows)>'
+
+
+class MonthlySummary(db.Model):
+    """Totals per user, month, category and currency for archived expenses."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.SmallInteger, db.ForeignKey('category.id'), nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY)
+    amount_minor = db.Column('amount', db.BigInteger, nullable=False, default=0)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+
+    amount = MoneyAttribute('amount_minor')
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'month', 'category_id', 'currency'),)
 
     def __repr__(self):
-        return f'<Goal {self.name} {self.current_amount}/{self.target_amount}>'
\ No newline at end of file
+        return f'<MonthlySummary user {self.user_id} {self.month:%Y-%m} category {self.category_id} {self.amount}>'
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""Exact money amounts.
+
+Amounts are stored as integers in the currency's minor unit (paise, cents;
+whole yen for JPY), so sums in SQL and in Python are exact. ``Money`` pairs
+that integer with its currency code and is what models, forms and templates
+pass around.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from currency import DEFAULT_CURRENCY, minor_units
+
+
+# Amounts are stored in BIGINT columns
+MAX_MINOR = 2 ** 63 - 1
+
+
+def to_minor(value, code):
+    """Convert a major-unit amount (str, int, float or Decimal) to minor units.
+
+    Raises ``ValueError`` for anything that isn't a finite number or doesn't
+    fit in a BIGINT column once scaled.
+    """
+    try:
+        amount = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+        if not amount.is_finite():
+            raise ValueError(f"Invalid amount: {value!r}")
+        minor = int(amount.scaleb(minor_units(code)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid amount: {value!r}")
+    if abs(minor) > MAX_MINOR:
+        raise ValueError(f"Amount too large: {value!r}")
+    return minor
+
+
+class Money:
+    """An integer number of minor units in one currency."""
+
+    __slots__ = ('minor', 'currency')
+
+    def __init__(self, minor, currency=DEFAULT_CURRENCY):
+        self.minor = int(minor)
+        self.currency = currency
+
+    @classmethod
+    def parse(cls, value, currency=DEFAULT_CURRENCY):
+        """Build from a major-unit value, e.g. ``Money.parse('12.50', 'USD')``."""
+        return cls(to_minor(value, currency), currency)
+
+    def to_decimal(self):
+        return Decimal(self.minor).scaleb(-minor_units(self.currency))
+
+    def convert(self, rates, currency):
+        """Convert into ``currency`` using a ``fx.RateTable``."""
+        if currency == self.currency:
+            return self
+        return Money(rates.convert_minor(self.minor, self.currency, currency), currency)
+
+    def _check(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        if other.currency != self.currency:
+            raise ValueError(f"Cannot combine {self.currency} and {other.currency} amounts")
+        return other.minor
+
+    def __add__(self, other):
+        minor = self._check(other)
+        if minor is NotImplemented:
+            return minor
+        return Money(self.minor + minor, self.currency)
+
+    def __sub__(self, other):
+        minor = self._check(other)
+        if minor is NotImplemented:
+            return minor
+        return Money(self.minor - minor, self.currency)
+
+    def __neg__(self):
+        return Money(-self.minor, self.currency)
+
+    def __bool__(self):
+        return self.minor != 0
+
+    def __eq__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.minor == other.minor and self.currency == other.currency
+
+    def __lt__(self, other):
+        return self.minor < self._check(other)
+
+    def __le__(self, other):
+        return self.minor <= self._check(other)
+
+    def __gt__(self, other):
+        return self.minor > self._check(other)
+
+    def __ge__(self, other):
+        return self.minor >= self._check(other)
+
+    def __hash__(self):
+        return hash((self.minor, self.currency))
+
+    def __float__(self):
+        return self.minor / 10 ** minor_units(self.currency)
+
+    def __str__(self):
+        # Plain major-unit text, suitable for form values: "1234.50"
+        return str(self.to_decimal())
+
+    def __repr__(self):
+        return f'<Money {self.currency} {self}>'
+
+
+class MoneyAttribute:
+    """Model attribute exposing an integer minor-unit column as ``Money``.
+
+    The row's ``currency`` column supplies the currency; assigning a
+    ``Money`` in a different currency is an error.
+    """
+
+    def __init__(self, column):
+        self.column = column
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        minor = getattr(obj, self.column)
+        return None if minor is None else Money(minor, obj.currency)
+
+    def __set__(self, obj, value):
+        if obj.currency is None:
+            obj.currency = value.currency
+        elif value.currency != obj.currency:
+            raise ValueError(f"Cannot store a {value.currency} amount on a {obj.currency} row")
+        setattr(obj, self.column, value.minor)
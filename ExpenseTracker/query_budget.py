@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""Check how many SQL statements and rows each route costs.
+
+Seeds a throwaway SQLite database, replays a scripted session through the
+Flask test client and records every statement (and the rows fetched by it)
+per request. The counts are compared with ``query_budgets.json``; any route
+that goes over budget is reported with its statements and the script exits
+with status 1, so it can run in CI next to a smoke test. Fingerprinted asset
+responses are also checked for cache headers that would defeat caching.
+
+Usage: python query_budget.py [--update] [--verbose]
+
+--update rewrites the budgets file with the current counts; review the diff
+before committing it.
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+# The app reads DATABASE_URL at import time, so point it at a scratch DB first
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = f"sqlite:///{Path(_tmpdir.name, 'query_budget.db').as_posix()}"
+
+from sqlalchemy import event  # noqa: E402
+
+from main import app  # noqa: E402
+from app import db  # noqa: E402
+from migrate_db import upgrade  # noqa: E402
+
+BUDGETS_FILE = Path(__file__).with_name('query_budgets.json')
+SEED_EXPENSES = 120
+
+
+class Recorder:
+    """Statements issued while ``active``, as ``[sql, rows_fetched]`` pairs."""
+
+    def __init__(self):
+        self.active = False
+        self.statements = []
+
+    def start(self):
+        self.statements = []
+        self.active = True
+
+    def stop(self):
+        self.active = False
+        return self.statements
+
+
+recorder = Recorder()
+
+
+class _CountingCursor(sqlite3.Cursor):
+    """Adds fetched rows to the statement recorded for this cursor."""
+
+    entry = None
+
+    def _count(self, rows):
+        if self.entry is not None:
+            self.entry[1] += rows
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count(len(rows))
+        return rows
+
+
+class _CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+
+def _install_listeners(engine):
+    @event.listens_for(engine, 'do_connect')
+    def use_counting_connection(dialect, conn_rec, cargs, cparams):
+        cparams['factory'] = _CountingConnection
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if not recorder.active:
+            return
+        entry = [' '.join(statement.split()), 0]
+        recorder.statements.append(entry)
+        cursor.entry = entry
+
+
+def _seed(client):
+    """Create one user with a few months of data, some of it archived."""
+    from archive import archive_expenses, cutoff_date
+    from categories import category_id
+
+    client.post('/register', data={
+        'username': 'budget', 'email': 'budget@example.com',
+        'password': 'password1', 'confirm_password': 'password1',
+    })
+    client.post('/login', data={'email': 'budget@example.com', 'password': 'password1'})
+
+    # Dates are anchored to month starts so the counts don't depend on today's date
+    today = date.today()
+    with app.app_context():
+        categories = [category_id(slug) for slug in ('food', 'transportation', 'entertainment', 'utilities', 'shopping')]
+    for i in range(SEED_EXPENSES):
+        day = cutoff_date(today, i // 8) + timedelta(days=(i % 8) * 3)
+        client.post('/add_expense', data={
+            'amount': f'{100 + i * 7}.50', 'currency': 'USD' if i % 10 == 0 else 'INR',
+            'category': categories[i % len(categories)], 'date': day.isoformat(),
+            'description': f'Seed expense {i}',
+        })
+    for category in categories[:2] + categories[4:]:
+        client.post('/budgets', data={'category': category, 'amount': '5000', 'rollover': 'y'})
+    # Never due today, so /run_recurring always creates exactly the one added in the scenario
+    for day in [d for d in (1, 15, 27) if d != min(today.day, 28)][:2]:
+        client.post('/recurring', data={'amount': '999', 'category': categories[3],
+                                        'description': 'Bill', 'day_of_month': day})
+    for goal_id, name in enumerate(('Car', 'Holiday'), start=1):
+        client.post('/create_goal', data={'name': name, 'target_amount': '100000'})
+        client.post(f'/contribute_goal/{goal_id}', data={'amount': '250', 'source_category': 'savings'})
+
+    with app.app_context():
+        archive_expenses(cutoff_date(today, app.config['ARCHIVE_AFTER_MONTHS']))
+        db.session.commit()
+
+    # A second user whose only expense is dated next month
+    client.get('/logout')
+    client.post('/register', data={
+        'username': 'future', 'email': 'future@example.com',
+        'password': 'password1', 'confirm_password': 'password1',
+    })
+    client.post('/login', data={'email': 'future@example.com', 'password': 'password1'})
+    client.post('/add_expense', data={
+        'amount': '75.00', 'currency': 'INR', 'category': categories[0],
+        'date': cutoff_date(today, -1).isoformat(), 'description': 'Booked ahead',
+    })
+    client.get('/logout')
+    client.post('/login', data={'email': 'budget@example.com', 'password': 'password1'})
+
+
+def _check_seed():
+    """Fail loudly if seeding went wrong.
+
+    Every seed POST redirects whether or not its form validated, and a
+    broken seed would make every route cheaper rather than fail a budget.
+    """
+    from models import (Budget, Expense, ExpenseArchive, GoalContribution, RecurringTransaction,
+                        SavingsGoal, User)
+
+    with app.app_context():
+        users = dict(db.session.query(User.username, User.id))
+        owner = users.get('budget')
+
+        def count(model, user_id=owner):
+            return db.session.query(model).filter(model.user_id == user_id).count()
+
+        archived = (db.session.query(db.func.coalesce(db.func.sum(ExpenseArchive.row_count), 0))
+                    .filter(ExpenseArchive.user_id == owner).scalar())
+        found = {
+            'users': len(users),
+            'expenses (live + archived)': count(Expense) + archived,
+            'some months archived': count(ExpenseArchive) > 0,
+            'budgets': count(Budget),
+            'recurring': count(RecurringTransaction),
+            'goals': count(SavingsGoal),
+            'goal contributions': count(GoalContribution),
+            'future user expenses': count(Expense, users.get('future')),
+        }
+    expected = {
+        'users': 2,
+        'expenses (live + archived)': SEED_EXPENSES,
+        'some months archived': True,
+        'budgets': 3,
+        'recurring': 2,
+        'goals': 2,
+        'goal contributions': 2,
+        'future user expenses': 1,
+    }
+    wrong = [f"{name}: expected {expected[name]}, got {found[name]}"
+             for name in expected if found[name] != expected[name]]
+    if wrong:
+        raise SystemExit('Seeding failed, so the counts would be meaningless:\n  ' + '\n  '.join(wrong))
+
+
+def _scenario():
+    """(name, method, path, kwargs) for every route, in replay order."""
+    from archive import cutoff_date
+    from assets import registry
+    from categories import category_id
+
+    today = date.today()
+    with app.app_context():
+        food, utilities = category_id('food'), category_id('utilities')
+    ajax = {'X-Requested-With': 'XMLHttpRequest'}
+    expense = {'amount': '42.00', 'currency': 'INR', 'category': food,
+               'date': today.isoformat(), 'description': 'Budget check'}
+    return [
+        ('GET /', 'get', '/', {}),
+        ('GET /expenses', 'get', '/expenses', {}),
+        ('GET /expenses archived', 'get', '/expenses?archived=1', {}),
+        ('GET /filter_expenses', 'get',
+         f'/filter_expenses?category={food}&start_date={cutoff_date(today, 2).isoformat()}', {}),
+        ('GET /filter_expenses all', 'get', '/filter_expenses?category=all', {}),
+        ('GET /dashboard', 'get', '/dashboard', {}),
+        ('GET /assets', 'get', f"/assets/{registry.get('css/style.css').url_path}", {}),
+        ('GET /api/chart_data', 'get', '/api/chart_data', {}),
+        ('GET /api/analytics', 'get', '/api/analytics', {}),
+        ('GET /api/analytics cached', 'get', '/api/analytics', {}),
+        ('POST /api/categories', 'post', '/api/categories', {'json': {'label': 'Pets', 'icon': 'paw'}}),
+        ('POST /add_expense', 'post', '/add_expense', {'data': expense}),
+        ('POST /edit_expense', 'post', '/edit_expense/1', {'data': expense}),
+        ('POST /delete_expense', 'post', '/delete_expense/2', {}),
+        ('POST /budgets', 'post', '/budgets', {'data': {'category': utilities, 'amount': '800'}}),
+        ('POST /edit_budget', 'post', '/edit_budget/1', {'data': {'amount': '6000'}}),
+        ('POST /edit_budget ajax', 'post', '/edit_budget/1', {'data': {'amount': '6500'}, 'headers': ajax}),
+        ('POST /delete_budget', 'post', '/delete_budget/4', {}),
+        ('POST /close_month', 'post', '/close_month', {}),
+        ('POST /recurring', 'post', '/recurring',
+         {'data': {'amount': '50', 'category': utilities, 'description': 'Phone', 'day_of_month': min(today.day, 28)}}),
+        ('POST /run_recurring', 'post', '/run_recurring', {}),
+        ('POST /edit_recurring', 'post', '/edit_recurring/1', {'data': {'amount': '1000', 'active': 'y'}}),
+        ('POST /delete_recurring', 'post', '/delete_recurring/2', {}),
+        ('POST /create_goal', 'post', '/create_goal', {'data': {'name': 'Laptop', 'target_amount': '80000'}}),
+        ('POST /contribute_goal', 'post', '/contribute_goal/1', {'data': {'amount': '100', 'source_category': 'savings'}}),
+        ('POST /api/goals/contributions', 'post', '/api/goals/contributions',
+         {'json': {'contributions': [{'goal_id': 1, 'amount': '10', 'source_category': 'savings'},
+                                     {'goal_id': 2, 'amount': '20', 'source_category': 'savings'}]}}),
+        ('POST /edit_goal', 'post', '/edit_goal/2', {'data': {'name': 'Trip', 'target_amount': '120000'}}),
+        ('POST /delete_goal', 'post', '/delete_goal/3', {}),
+        ('POST /set_currency', 'post', '/set_currency', {'json': {'currency': 'USD'}}),
+        ('GET /dashboard USD', 'get', '/dashboard', {}),
+        ('GET /logout', 'get', '/logout', {}),
+        ('GET /login', 'get', '/login', {}),
+        ('POST /login', 'post', '/login', {'data': {'email': 'budget@example.com', 'password': 'password1'}}),
+        ('GET /logout future', 'get', '/logout', {}),
+        ('POST /login future', 'post', '/login', {'data': {'email': 'future@example.com', 'password': 'password1'}}),
+        ('GET /api/analytics future only', 'get', '/api/analytics', {}),
+    ]
+
+
+def _header_problems(path, response):
+    """Caching mistakes that don't show up as SQL: fingerprinted assets must stay
+    cacheable whatever happens to the session cookie."""
+    problems = []
+    if path.startswith('/assets/') and response.status_code == 200:
+        if 'cookie' in {value.lower() for value in response.vary}:
+            problems.append('Vary: Cookie on an immutable asset')
+        if not response.cache_control.immutable:
+            problems.append('asset is not Cache-Control: immutable')
+    return problems
+
+
+def measure():
+    """Replay the scenario and return ``{name: (statements, status, header_problems)}``."""
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        _install_listeners(db.engine)
+        upgrade()
+    client = app.test_client()
+    _seed(client)
+    _check_seed()
+
+    results = {}
+    for name, method, path, kwargs in _scenario():
+        recorder.start()
+        response = getattr(client, method)(path, **kwargs)
+        results[name] = (recorder.stop(), response.status_code, _header_problems(path, response))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-route SQL statement and row budgets.')
+    parser.add_argument('--update', action='store_true', help=f'rewrite {BUDGETS_FILE.name} with the current counts')
+    parser.add_argument('--verbose', action='store_true', help='print every statement, not just for failing routes')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = measure()
+    budgets = {} if args.update or not BUDGETS_FILE.exists() else json.loads(BUDGETS_FILE.read_text())
+
+    failures = 0
+    print(f"{'route':<32} {'status':>6} {'statements':>12} {'rows':>12}")
+    for name, (statements, status, problems) in results.items():
+        count = len(statements)
+        rows = sum(entry[1] for entry in statements)
+        budget = budgets.get(name)
+        over = list(problems)
+        if status >= 500:
+            over.append(f'status {status}')
+        if budget is not None:
+            if count > budget['statements']:
+                over.append(f"statements {count} > {budget['statements']}")
+            if rows > budget['rows']:
+                over.append(f"rows {rows} > {budget['rows']}")
+        elif not args.update:
+            over.append('no budget')
+        limit = f"/{budget['statements']}" if budget else ''
+        row_limit = f"/{budget['rows']}" if budget else ''
+        print(f"{name:<32} {status:>6} {f'{count}{limit}':>12} {f'{rows}{row_limit}':>12}"
+              f"{'  FAIL: ' + ', '.join(over) if over else ''}")
+        if over or args.verbose:
+            failures += bool(over)
+            seen = set()
+            for sql, fetched in statements:
+                repeat = ' (repeated)' if sql in seen else ''
+                seen.add(sql)
+                print(f"    [{fetched:>4} rows]{repeat} {sql}")
+
+    if args.update:
+        budgets = {
+            name: {'statements': len(statements), 'rows': sum(entry[1] for entry in statements)}
+            for name, (statements, status, problems) in results.items()
+        }
+        BUDGETS_FILE.write_text(json.dumps(budgets, indent=2) + '\n')
+        print(f"\nWrote {BUDGETS_FILE.name}")
+        return 0
+    if failures:
+        print(f"\n{failures} route(s) over budget. Fix the regression or, if the cost is intended, "
+              f"run with --update and commit the new budgets.")
+        return 1
+    print('\nAll routes within budget.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,75 @@
 import logging
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_user, current_user, logout_user, login_required
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from app import app, db
-from models import User, Expense, Budget, RecurringTransaction, SavingsGoal
-from forms import ExpenseForm, LoginForm, RegistrationForm, BudgetForm, RecurringForm, GoalForm, ContributionForm
+from currency import current_currency
+from fx import rate_table
+from goals import GoalAccessError, record_contributions
+from money import Money
+from models import User, Category, Expense, Budget, RecurringTransaction, SavingsGoal, MonthlySummary
+from archive import archived_expenses
+from analytics import expense_arrays, spending_report
+from categories import category_id, get_category, invalidate as invalidate_categories, slugify
+from forms import ExpenseForm, LoginForm, RegistrationForm, BudgetForm, RecurringForm, GoalForm, ContributionForm, CONTRIBUTION_SOURCES
+
+
+def _month_bounds(day):
+    """Return the first day of ``day``'s month and of the following month."""
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def _with_archived(expenses, user_id, start=None, end=None, category=None):
+    """Merge archived expenses in the date range into a date-descending list."""
+    archived = archived_expenses(user_id, start, end, category)
+    if not archived:
+        return expenses
+    return sorted(expenses + archived, key=lambda e: e.date, reverse=True)
+
+
+def _json_id(value):
+    """``value`` as a row id if it is an int or a string of digits, else None.
+
+    Floats and booleans are rejected rather than truncated to some other id.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    return None
+
+
+def _category_spending(user_id, currency, rates, start=None, end=None, category=None):
+    """Sum a user's expenses per category id as ``Money`` in ``currency``.
+
+    The database returns one exact integer sum per (category, currency);
+    only those few group totals are converted, so rounding happens once per
+    group rather than once per expense. Archived months are read from
+    ``MonthlySummary``, so ``start``/``end`` should be month boundaries.
+    """
+    live = db.session.query(Expense.category_id, Expense.currency, func.sum(Expense.amount_minor))
+    live = live.filter(Expense.user_id == user_id)
+    archived = db.session.query(MonthlySummary.category_id, MonthlySummary.currency, func.sum(MonthlySummary.amount_minor))
+    archived = archived.filter(MonthlySummary.user_id == user_id)
+    if start:
+        live = live.filter(Expense.date >= start)
+        archived = archived.filter(MonthlySummary.month >= start)
+    if end:
+        live = live.filter(Expense.date < end)
+        archived = archived.filter(MonthlySummary.month < end)
+    if category:
+        live = live.filter(Expense.category_id == category)
+        archived = archived.filter(MonthlySummary.category_id == category)
+    live = live.group_by(Expense.category_id, Expense.currency)
+    archived = archived.group_by(MonthlySummary.category_id, MonthlySummary.currency)
+    spending = {}
+    for cat, cur, total in live.union_all(archived):
+        converted = rates.convert_minor(int(total), cur, currency)
+        spending[cat] = spending.get(cat, 0) + converted
+    return {cat: Money(minor, currency) for cat, minor in spending.items()}
 
 @app.route('/')
 def index():
@@ -62,10 +127,13 @@ def logout():
 @app.route('/expenses')
 @login_required
 def expenses():
-    """Show user's expenses"""
-    form = ExpenseForm()
+    """Show user's expenses; archived months only with ``?archived=1``"""
+    form = ExpenseForm(currency=current_currency())
     user_expenses = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc()).all()
-    return render_template('index.html', expenses=user_expenses, form=form)
+    include_archived = request.args.get('archived', type=int) == 1
+    if include_archived:
+        user_expenses = _with_archived(user_expenses, current_user.id)
+    return render_template('index.html', expenses=user_expenses, form=form, include_archived=include_archived)
 
 @app.route('/add_expense', methods=['POST'])
 @login_required
@@ -76,8 +144,8 @@ def add_expense():
     if form.validate_on_submit():
         # Create expense object
         expense = Expense(
-            amount=float(form.amount.data),
-            category=form.category.data,
+            amount=form.amount.money(form.currency.data),
+            category_id=form.category.data,
             date=form.date.data,
             description=form.description.data,
             user_id=current_user.id
@@ -110,8 +178,9 @@ def edit_expense(expense_id):
     
     form = ExpenseForm()
     if form.validate_on_submit():
-        expense.amount = float(form.amount.data)
-        expense.category = form.category.data
+        expense.currency = form.currency.data
+        expense.amount = form.amount.money(expense.currency)
+        expense.category_id = form.category.data
         expense.date = form.date.data
         expense.description = form.description.data
         
@@ -145,7 +214,7 @@ def delete_expense(expense_id):
 @login_required
 def filter_expenses():
     """Filter expenses by category and date range"""
-    category = request.args.get('category')
+    category = request.args.get('category', type=int)  # None for 'all'
     start_date_str = request.args.get('start_date')
     end_date_str = request.args.get('end_date')
     
@@ -153,10 +222,11 @@ def filter_expenses():
     query = Expense.query.filter_by(user_id=current_user.id)
     
     # Filter by category if provided
-    if category and category != 'all':
-        query = query.filter_by(category=category)
+    if category:
+        query = query.filter_by(category_id=category)
     
     # Filter by date range if provided
+    start_date = end_date = None
     if start_date_str:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         query = query.filter(Expense.date >= start_date)
@@ -167,41 +237,44 @@ def filter_expenses():
     
     # Get filtered expenses and sort by date
     filtered_expenses = query.order_by(Expense.date.desc()).all()
+    # The archive is only read when a date range (or ?archived=1) asks for it
+    if start_date or end_date or request.args.get('archived', type=int) == 1:
+        filtered_expenses = _with_archived(
+            filtered_expenses, current_user.id, start_date, end_date,
+            category,
+        )
     
-    return render_template('index.html', expenses=filtered_expenses, form=ExpenseForm())
+    return render_template('index.html', expenses=filtered_expenses, form=ExpenseForm(currency=current_currency()))
 
 @app.route('/dashboard')
 @login_required
 def dashboard():
     """Render dashboard with expense summary"""
-    # Get user's expenses
-    user_expenses = Expense.query.filter_by(user_id=current_user.id).all()
-    
-    # Get all unique categories
-    categories = {expense.category for expense in user_expenses}
-    
-    # Calculate total spending
-    total_spent = sum(expense.amount for expense in user_expenses)
-    
-    # Calculate spending by category
-    category_spending = {}
-    for category in categories:
-        category_total = sum(expense.amount for expense in user_expenses if expense.category == category)
-        category_spending[category] = category_total
-    
+    currency = current_currency()
+    rates = rate_table()
+
+    # Spending by category, converted to the display currency in SQL
+    category_spending = _category_spending(current_user.id, currency, rates)
+    total_spent = Money(sum(m.minor for m in category_spending.values()), currency)
+
+    expense_count = Expense.query.filter_by(user_id=current_user.id).count()
+    expense_count += db.session.query(func.coalesce(func.sum(MonthlySummary.expense_count), 0)).filter(
+        MonthlySummary.user_id == current_user.id
+    ).scalar()
+    recent_expenses = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date.desc()).limit(5).all()
+
     # Budgets for user
     budgets = Budget.query.filter_by(user_id=current_user.id).all()
 
     # For each budget compute spent this month
-    now = datetime.utcnow().date()
-    def spent_this_month(category):
-        return sum(e.amount for e in user_expenses if e.category == category and e.date.month == now.month and e.date.year == now.year)
+    month_start, month_end = _month_bounds(datetime.utcnow().date())
+    month_spending = _category_spending(current_user.id, currency, rates, month_start, month_end)
 
     budget_status = []
     for b in budgets:
-        spent = spent_this_month(b.category)
-        available = b.amount + (b.rollover_balance if b.rollover else 0)
-        percent = (spent / available * 100) if available > 0 else 0
+        spent = month_spending.get(b.category_id, Money(0, currency))
+        available = Money(b.available(), b.currency).convert(rates, currency)
+        percent = (spent.minor / available.minor * 100) if available.minor > 0 else 0
         budget_status.append({'budget': b, 'spent': spent, 'available': available, 'percent': min(100, percent)})
 
     # Recurring transactions
@@ -214,7 +287,8 @@ def dashboard():
         'dashboard.html',
         total_spent=total_spent,
         category_spending=category_spending,
-        expenses=user_expenses,
+        expense_count=expense_count,
+        recent_expenses=recent_expenses,
         budgets=budget_status,
         recurring=recurring,
         goals=goals,
@@ -230,7 +304,7 @@ def dashboard():
 def add_budget():
     form = BudgetForm()
     if form.validate_on_submit():
-        b = Budget(user_id=current_user.id, category=form.category.data, amount=float(form.amount.data), rollover=bool(form.rollover.data))
+        b = Budget(user_id=current_user.id, category_id=form.category.data, amount=form.amount.money(current_currency()), rollover=bool(form.rollover.data))
         db.session.add(b)
         db.session.commit()
         flash('Budget added', 'success')
@@ -249,7 +323,7 @@ def run_recurring():
         # if not run this month and day matches
         if (not r.last_run) or (r.last_run.month != today.month or r.last_run.year != today.year):
             if r.day_of_month == today.day or (r.day_of_month > 28 and today.day >= 28):
-                exp = Expense(amount=r.amount, category=r.category, date=today, description=(r.description or 'Recurring'), user_id=current_user.id)
+                exp = Expense(amount=r.amount, category_id=r.category_id, date=today, description=(r.description or 'Recurring'), user_id=current_user.id)
                 db.session.add(exp)
                 r.last_run = today
                 created += 1
@@ -263,7 +337,7 @@ def run_recurring():
 def add_recurring():
     form = RecurringForm()
     if form.validate_on_submit():
-        r = RecurringTransaction(user_id=current_user.id, amount=float(form.amount.data), category=form.category.data, description=form.description.data, day_of_month=int(form.day_of_month.data))
+        r = RecurringTransaction(user_id=current_user.id, amount=form.amount.money(current_currency()), category_id=form.category.data, description=form.description.data, day_of_month=int(form.day_of_month.data))
         db.session.add(r)
         db.session.commit()
         flash('Recurring transaction added', 'success')
@@ -277,7 +351,7 @@ def add_recurring():
 def create_goal():
     form = GoalForm()
     if form.validate_on_submit():
-        g = SavingsGoal(user_id=current_user.id, name=form.name.data, target_amount=float(form.target_amount.data))
+        g = SavingsGoal(user_id=current_user.id, name=form.name.data, target_amount=form.target_amount.money(current_currency()))
         db.session.add(g)
         db.session.commit()
         flash('Goal created', 'success')
@@ -291,17 +365,77 @@ def create_goal():
 def contribute_goal(goal_id):
     form = ContributionForm()
     goal = SavingsGoal.query.get_or_404(goal_id)
+    if goal.user_id != current_user.id:
+        flash('Not authorized', 'danger')
+        return redirect(url_for('dashboard'))
     if form.validate_on_submit():
-        amount = float(form.amount.data)
-        # Add contribution to goal
-        goal.current_amount = (goal.current_amount or 0) + amount
-        db.session.commit()
+        amount = form.amount.money(goal.currency)
+        # Ledger row + atomic increment; no read-modify-write of the total
+        record_contributions(current_user.id, [(goal.id, amount, form.source_category.data)])
         flash(f'Added {amount} to {goal.name}', 'success')
+        db.session.commit()
     else:
         flash('Invalid contribution', 'danger')
     return redirect(url_for('dashboard'))
 
 
+@app.route('/api/goals/contributions', methods=['POST'])
+@login_required
+def contribute_goals_bulk():
+    """Record several contributions at once.
+
+    Expects ``{"contributions": [{"goal_id": 1, "amount": "250.00", "source_category": "savings"}, ...]}``.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('contributions') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify(success=False, error='Expected {"contributions": [...]}'), 400
+    item_goal_ids = [_json_id(item.get('goal_id')) for item in items]
+    if None in item_goal_ids:
+        return jsonify(success=False, error='Each contribution needs an integer goal_id'), 400
+    goal_ids = set(item_goal_ids)
+    currencies = dict(
+        db.session.query(SavingsGoal.id, SavingsGoal.currency)
+        .filter(SavingsGoal.user_id == current_user.id, SavingsGoal.id.in_(goal_ids))
+    )
+    sources = {value for value, _ in CONTRIBUTION_SOURCES}
+    contributions = []
+    for item, goal_id in zip(items, item_goal_ids):
+        if goal_id not in currencies:
+            return jsonify(success=False, error=f'Goal {goal_id} not found'), 404
+        try:
+            amount = Money.parse(item.get('amount'), currencies[goal_id])
+        except (TypeError, ValueError):
+            return jsonify(success=False, error=f'Invalid amount for goal {goal_id}'), 400
+        if amount.minor <= 0:
+            return jsonify(success=False, error=f'Amount for goal {goal_id} must be greater than 0'), 400
+        source_category = item.get('source_category')
+        if source_category is not None and (not isinstance(source_category, str) or source_category not in sources):
+            return jsonify(success=False, error=f'Invalid source_category for goal {goal_id}'), 400
+        contributions.append((goal_id, amount, source_category))
+
+    try:
+        recorded = record_contributions(current_user.id, contributions)
+    except GoalAccessError as e:
+        db.session.rollback()
+        return jsonify(success=False, error=str(e)), 404
+    except Exception:
+        # The goal totals may already be updated; don't leave that half-done
+        db.session.rollback()
+        raise
+    db.session.commit()
+
+    totals = dict(
+        db.session.query(SavingsGoal.id, SavingsGoal.current_amount_minor)
+        .filter(SavingsGoal.id.in_(goal_ids))
+    )
+    goals = [
+        {'goal_id': goal_id, 'current_amount': float(Money(totals[goal_id] or 0, currencies[goal_id]))}
+        for goal_id in sorted(goal_ids)
+    ]
+    return jsonify(success=True, recorded=recorded, goals=goals)
+
+
 @app.route('/edit_budget/<int:budget_id>', methods=['POST'])
 @login_required
 def edit_budget(budget_id):
@@ -314,32 +448,30 @@ def edit_budget(budget_id):
     new_amount_str = request.form.get('amount')
     if new_amount_str is not None:
         try:
-            b.amount = float(new_amount_str)
-        except (ValueError, TypeError):
+            b.amount = Money.parse(new_amount_str, b.currency)
+        except ValueError:
             flash('Invalid amount provided for budget.', 'danger')
             # Fallback to old amount or handle as an error
             pass
 
     # Checkbox values are only present in the form if they are checked
     b.rollover = 'rollover' in request.form
-    
-    db.session.commit()
 
-    # If this is an AJAX request, return JSON so the frontend can update in-place
+    # If this is an AJAX request, return JSON so the frontend can update in-place.
+    # Built before the commit, which would expire b and current_user and cost two reloads.
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.is_json:
-        # compute spent this month for this budget's category
-        today = datetime.utcnow().date()
-        spent = 0.0
-        for e in Expense.query.filter_by(user_id=current_user.id, category=b.category).all():
-            try:
-                if e.date.month == today.month and e.date.year == today.year:
-                    spent += float(e.amount)
-            except Exception:
-                pass
-        available = b.amount + (b.rollover_balance if b.rollover else 0)
-        percent = min(100, (spent / available * 100) if available > 0 else 0)
-        return jsonify({'success': True, 'amount': b.amount, 'rollover': b.rollover, 'spent': spent, 'available': available, 'percent': percent})
+        # compute spent this month for this budget's category, in the display currency
+        currency = current_currency()
+        rates = rate_table()
+        month_start, month_end = _month_bounds(datetime.utcnow().date())
+        spent = _category_spending(current_user.id, currency, rates, month_start, month_end, b.category_id).get(b.category_id, Money(0, currency))
+        available = Money(b.available(), b.currency).convert(rates, currency)
+        percent = min(100, (spent.minor / available.minor * 100) if available.minor > 0 else 0)
+        payload = {'success': True, 'amount': float(b.amount), 'rollover': b.rollover, 'spent': float(spent), 'available': float(available), 'percent': percent}
+        db.session.commit()
+        return jsonify(payload)
 
+    db.session.commit()
     flash('Budget updated', 'success')
     return redirect(url_for('dashboard'))
 
@@ -367,8 +499,8 @@ def edit_recurring(rec_id):
 
     if 'amount' in request.form:
         try:
-            r.amount = float(request.form['amount'])
-        except (ValueError, TypeError):
+            r.amount = Money.parse(request.form['amount'], r.currency)
+        except ValueError:
             pass  # Keep old value if conversion fails
     
     if 'description' in request.form:
@@ -413,8 +545,8 @@ def edit_goal(goal_id):
 
     if 'target_amount' in request.form:
         try:
-            g.target_amount = float(request.form['target_amount'])
-        except (ValueError, TypeError):
+            g.target_amount = Money.parse(request.form['target_amount'], g.currency)
+        except ValueError:
             pass  # Keep old value if conversion fails
             
     db.session.commit()
@@ -439,17 +571,19 @@ def delete_goal(goal_id):
 @login_required
 def close_month():
     # For budgets with rollover enabled, compute unused and add to rollover_balance
-    now = datetime.utcnow().date()
-    user_expenses = Expense.query.filter_by(user_id=current_user.id).all()
-    def spent_for_month(category, month, year):
-        return sum(e.amount for e in user_expenses if e.category == category and e.date.month == month and e.date.year == year)
+    month_start, month_end = _month_bounds(datetime.utcnow().date())
+    rates = rate_table()
+    # Spending is converted into each budget's own currency; most users have one
+    spending_by_currency = {}
 
     budgets = Budget.query.filter_by(user_id=current_user.id).all()
     for b in budgets:
-        spent = spent_for_month(b.category, now.month, now.year)
-        unused = max(0.0, b.amount - spent)
+        if b.currency not in spending_by_currency:
+            spending_by_currency[b.currency] = _category_spending(current_user.id, b.currency, rates, month_start, month_end)
+        spent = spending_by_currency[b.currency].get(b.category_id)
+        unused = max(0, b.amount_minor - (spent.minor if spent else 0))
         if b.rollover and unused > 0:
-            b.rollover_balance = (b.rollover_balance or 0) + unused
+            b.rollover_balance_minor = (b.rollover_balance_minor or 0) + unused
     db.session.commit()
     flash('Month closed — rollovers applied where enabled', 'info')
     return redirect(url_for('dashboard'))
@@ -458,19 +592,55 @@ def close_month():
 @login_required
 def chart_data():
     """API endpoint for chart data"""
-    # Get user's expenses
-    user_expenses = Expense.query.filter_by(user_id=current_user.id).all()
+    # Category totals in the display currency, aggregated in SQL
+    category_spending = _category_spending(current_user.id, current_currency(), rate_table())
+    category_data = [{'category': get_category(cat_id).label, 'amount': float(amount)} for cat_id, amount in category_spending.items()]
     
-    # Get all unique categories
-    categories = {expense.category for expense in user_expenses}
-    
-    # Prepare data for chart
-    category_data = []
-    for category in categories:
-        category_total = sum(expense.amount for expense in user_expenses if expense.category == category)
-        category_data.append({
-            'category': category,
-            'amount': category_total
-        })
-    
-    return jsonify(category_data)
\ No newline at end of file
+    return jsonify(category_data)
+
+
+@app.route('/api/categories', methods=['POST'])
+@login_required
+def add_category():
+    """Create a custom category for the current user.
+
+    Expects ``{"label": "Pets", "icon": "paw"}``; ``icon`` is an optional Font Awesome name.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify(success=False, error='Expected a JSON object'), 400
+    label, icon = data.get('label') or '', data.get('icon') or 'tag'
+    if not isinstance(label, str) or not isinstance(icon, str):
+        return jsonify(success=False, error='label and icon must be strings'), 400
+    label = label.strip()[:50]
+    slug = slugify(label)
+    if not slug:
+        return jsonify(success=False, error='A category needs a label'), 400
+    if category_id(slug, current_user.id) is not None:
+        return jsonify(success=False, error=f'{label} already exists'), 409
+    category = Category(slug=slug, label=label, icon=icon[:30], user_id=current_user.id)
+    db.session.add(category)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Another request created the same slug since the check above
+        db.session.rollback()
+        return jsonify(success=False, error=f'{label} already exists'), 409
+    created = {'success': True, 'id': category.id, 'label': label}
+    db.session.commit()
+    invalidate_categories()
+    return jsonify(created), 201
+
+
+@app.route('/api/analytics')
+@login_required
+def analytics_data():
+    """Monthly totals, month-end forecasts and unusual expenses in the display currency"""
+    currency = current_currency()
+    rates = rate_table()
+    data = expense_arrays(current_user.id, currency, rates)
+    budgets = {
+        b.category_id: rates.convert_minor(b.available(), b.currency, currency)
+        for b in Budget.query.filter_by(user_id=current_user.id)
+    }
+    return jsonify(spending_report(data, date.today(), budgets))
@@ -9,6 +9,7 @@ document.addEventListener('DOMContentLoaded', function() {
             // Get expense data from data attributes
             const id = this.getAttribute('data-id');
             const amount = this.getAttribute('data-amount');
+            const currency = this.getAttribute('data-currency');
             const category = this.getAttribute('data-category');
             const date = this.getAttribute('data-date');
             const description = this.getAttribute('data-description');
@@ -18,6 +19,7 @@ document.addEventListener('DOMContentLoaded', function() {
             
             // Populate form fields
             document.getElementById('edit_amount').value = amount;
+            document.getElementById('edit_currency').value = currency;
             document.getElementById('edit_category').value = category;
             document.getElementById('edit_date').value = date;
             document.getElementById('edit_description').value = description;
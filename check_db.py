@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
-"""Small utility to inspect SQLite DB files and warn about multiple DB locations.
+"""Small utility to inspect and maintain the SQLite DB files.
 
-Usage: python check_db.py
+Usage:
+  python check_db.py                 scan for DB files and warn about multiple DB locations
+  python check_db.py backup          take an online, consistent backup into backup/
+  python check_db.py maintain        incremental VACUUM + ANALYZE
+  python check_db.py integrity       run integrity and foreign key checks
+  python check_db.py report          per-table/index sizes, row counts and missing indexes
+
+Every command except the scan accepts --db PATH; by default the database the
+app is configured to use is picked.
 """
+import argparse
 import os
 import sys
 import sqlite3
+import time
+from datetime import datetime
 from pathlib import Path
 
 
@@ -14,10 +25,12 @@ def find_dbs(root: Path):
 
 
 def get_app_db_uri():
-    # Import the app to read configured SQLALCHEMY_DATABASE_URI
-    sys.path.insert(0, str(Path.cwd()))
+    # Import the app to read configured SQLALCHEMY_DATABASE_URI. Its modules
+    # import each other by bare name (from currency import ...), so the
+    # package directory itself has to be on sys.path.
+    sys.path.insert(0, str(Path(__file__).resolve().parent / 'ExpenseTracker'))
     try:
-        from ExpenseTracker.app import app
+        from app import app
         return app.config.get('SQLALCHEMY_DATABASE_URI')
     except Exception as e:
         return None
@@ -29,7 +42,7 @@ def print_db_info(path: Path):
     print(f"- {path} (size: {size_kb:.1f} KB, modified: {stat.st_mtime})")
 
 
-def main():
+def scan():
     root = Path.cwd()
     print(f"Scanning for 'expense_tracker.db' under {root}")
     dbs = find_dbs(root)
@@ -56,5 +69,218 @@ def main():
         print('Could not import application to read configured DB URI.')
 
 
+def resolve_db_path(explicit):
+    """The --db argument, else the app's SQLite database, else the default instance DB.
+
+    Exits instead of guessing when DATABASE_URL is set but doesn't name a
+    SQLite file.
+    """
+    if explicit:
+        path = Path(explicit)
+    else:
+        app_uri = get_app_db_uri()
+        if app_uri and app_uri.startswith('sqlite:///'):
+            path = Path(app_uri.replace('sqlite:///', ''))
+        elif os.environ.get('DATABASE_URL'):
+            sys.exit('DATABASE_URL is set but is not a SQLite database this tool can open; pass --db PATH.')
+        else:
+            path = Path(__file__).resolve().parent / 'ExpenseTracker' / 'instance' / 'expense_tracker.db'
+    print(f"Using database: {path.resolve()}")
+    return path
+
+
+def connect(path: Path, read_only=False):
+    if not path.exists():
+        sys.exit(f"Database not found: {path}")
+    if read_only:
+        return sqlite3.connect(f"file:{path.resolve().as_posix()}?mode=ro", uri=True)
+    return sqlite3.connect(path)
+
+
+def user_tables(conn):
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+
+
+def backup(path: Path, dest_dir: Path, pages: int, sleep: float):
+    """Copy the live database with the SQLite online backup API.
+
+    Pages are copied ``pages`` at a time with a short sleep in between, so
+    the app can keep writing while the backup runs; the result is a
+    consistent snapshot.
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    target = dest_dir / f"{path.resolve().parent.name}_{path.stem}_{stamp}.db"
+
+    def progress(status, remaining, total):
+        done = total - remaining
+        print(f"\r  copied {done}/{total} pages", end='', flush=True)
+
+    src = connect(path, read_only=True)
+    dst = sqlite3.connect(target)
+    started = time.monotonic()
+    try:
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+        print()
+        result = dst.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    elapsed = time.monotonic() - started
+    size_kb = target.stat().st_size / 1024
+    print(f"Backup written to {target} ({size_kb:.1f} KB in {elapsed:.2f}s), quick_check: {result}")
+    return result == 'ok'
+
+
+def maintain(path: Path, vacuum_pages: int, full_vacuum: bool):
+    conn = connect(path)
+    try:
+        mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if mode == 2:
+            # Incremental mode: release free pages a chunk at a time
+            # Each step of the pragma frees one page. execute() steps a statement
+            # without result columns only once; executescript() runs it to completion.
+            conn.executescript(f'PRAGMA incremental_vacuum({int(vacuum_pages)});')
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            print(f"Incremental vacuum: free pages {free_before} -> {free_after}")
+        elif full_vacuum:
+            # One-off rebuild that also switches the file to incremental mode
+            print('Running full VACUUM and enabling incremental auto_vacuum (blocks writers until done)...')
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            print(f"VACUUM complete: free pages {free_before} -> {free_after}")
+        else:
+            print(f"auto_vacuum is {'FULL' if mode == 1 else 'NONE'}; incremental vacuum is unavailable "
+                  f"({free_before} free pages). Run once with --full-vacuum to enable it.")
+        conn.execute('ANALYZE')
+        conn.commit()
+        print('ANALYZE complete: query planner statistics refreshed.')
+    finally:
+        conn.close()
+
+
+def integrity(path: Path, quick: bool):
+    conn = connect(path, read_only=True)
+    try:
+        pragma = 'quick_check' if quick else 'integrity_check'
+        problems = [row[0] for row in conn.execute(f'PRAGMA {pragma}')]
+        fk_problems = conn.execute('PRAGMA foreign_key_check').fetchall()
+    finally:
+        conn.close()
+    ok = problems == ['ok'] and not fk_problems
+    if problems == ['ok']:
+        print(f"{pragma}: ok")
+    else:
+        print(f"{pragma}: {len(problems)} problem(s)")
+        for problem in problems:
+            print(f"  {problem}")
+    print(f"foreign_key_check: {'ok' if not fk_problems else f'{len(fk_problems)} problem(s)'}")
+    for table, rowid, parent, _ in fk_problems:
+        print(f"  {table} row {rowid} references missing {parent}")
+    return ok
+
+
+def missing_user_indexes(conn):
+    """Tables with a user_id column but no index that starts with it."""
+    missing = []
+    for table in user_tables(conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+        if 'user_id' not in columns:
+            continue
+        leading = set()
+        for index in conn.execute(f'PRAGMA index_list("{table}")'):
+            first = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchone()
+            if first:
+                leading.add(first[2])
+        if 'user_id' not in leading:
+            missing.append(table)
+    return missing
+
+
+def report(path: Path):
+    conn = connect(path, read_only=True)
+    try:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        print(f"{path}: {page_count} pages x {page_size} B = {page_count * page_size / 1024:.1f} KB "
+              f"({freelist} free pages)\n")
+
+        try:
+            sizes = dict(conn.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name'))
+        except sqlite3.OperationalError:
+            sizes = None
+            print('(this SQLite build has no dbstat table; object sizes unavailable)\n')
+
+        objects = conn.execute(
+            "SELECT type, name, tbl_name FROM sqlite_master "
+            "WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%' ORDER BY tbl_name, type DESC, name"
+        ).fetchall()
+        print(f"{'object':<40} {'type':<6} {'rows':>10} {'size':>12}")
+        for kind, name, table in objects:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] if kind == 'table' else ''
+            size = f"{sizes.get(name, 0) / 1024:.1f} KB" if sizes is not None else '-'
+            label = name if kind == 'table' else f"  {name}"
+            print(f"{label:<40} {kind:<6} {rows:>10} {size:>12}")
+
+        missing = missing_user_indexes(conn)
+    finally:
+        conn.close()
+
+    print()
+    if missing:
+        for table in missing:
+            print(f"Warning: {table}.user_id is not indexed; per-user queries scan the whole table.")
+            print(f"  fix: CREATE INDEX ix_{table}_user_id ON {table} (user_id);")
+    else:
+        print('All user_id columns are indexed.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and maintain the expense tracker SQLite database.')
+    sub = parser.add_subparsers(dest='command')
+
+    p_backup = sub.add_parser('backup', help='online, consistent backup via the SQLite backup API')
+    p_backup.add_argument('--db')
+    p_backup.add_argument('--dest', default=str(Path(__file__).resolve().parent / 'backup'))
+    p_backup.add_argument('--pages', type=int, default=256, help='pages copied per step (default 256)')
+    p_backup.add_argument('--sleep', type=float, default=0.05, help='seconds to yield to writers between steps')
+
+    p_maintain = sub.add_parser('maintain', help='incremental VACUUM and ANALYZE')
+    p_maintain.add_argument('--db')
+    p_maintain.add_argument('--vacuum-pages', type=int, default=1000, help='free pages to release (default 1000)')
+    p_maintain.add_argument('--full-vacuum', action='store_true',
+                            help='if incremental vacuum is off, VACUUM once and switch it on')
+
+    p_integrity = sub.add_parser('integrity', help='integrity and foreign key checks')
+    p_integrity.add_argument('--db')
+    p_integrity.add_argument('--quick', action='store_true', help='PRAGMA quick_check instead of integrity_check')
+
+    p_report = sub.add_parser('report', help='table/index sizes, row counts and missing user_id indexes')
+    p_report.add_argument('--db')
+
+    args = parser.parse_args()
+    if args.command is None:
+        scan()
+        return
+
+    path = resolve_db_path(args.db)
+    if args.command == 'backup':
+        ok = backup(path, Path(args.dest), args.pages, args.sleep)
+    elif args.command == 'maintain':
+        maintain(path, args.vacuum_pages, args.full_vacuum)
+        ok = True
+    elif args.command == 'integrity':
+        ok = integrity(path, args.quick)
+    else:
+        report(path)
+        ok = True
+    sys.exit(0 if ok else 1)
+
+
 if __name__ == '__main__':
     main()